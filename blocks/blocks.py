@@ -1,14 +1,114 @@
+import hashlib
 import random
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.template.loader import get_template
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
 
 from wagtail import blocks
 from wagtail.images.blocks import ImageChooserBlock
-from wagtail.contrib.table_block.blocks import TableBlock
+from wagtail.contrib.table_block import blocks as table_blocks
+from wagtail.models import Page
 from wagtail.snippets.blocks import SnippetChooserBlock
 
+from blocks.loaders import BlockDataLoader
+from images.renditions import RenditionManifest
+from site_settings import cache as fragment_cache
+from site_settings import instrumentation, page_cache, page_urls, richtext
+from site_settings.listings import set_listing_urls
 
-class TextBlock(blocks.TextBlock):
+
+class InstrumentedBlockMixin:
+    """
+    Add the block's render time to the current request's measurements and
+    profile it on sampled requests (see site_settings.instrumentation). Nested
+    blocks are only counted once in the request's block time.
+    """
+    def render(self, value, context=None):
+        render = super().render
+        return instrumentation.profile_block(self, value, context, lambda: render(value, context=context))
+
+
+def template_fingerprint(template_name):
+    """
+    Return a hash of a block template's source, part of the fragment cache key
+    so that editing the template leaves the HTML rendered with the old one
+    behind. Computed once per process (templates only change with a deploy,
+    which restarts the processes), or on every render with DEBUG on.
+    """
+    if not template_name:
+        return ""
+    fingerprint = _template_fingerprints.get(template_name)
+    if fingerprint is None or settings.DEBUG:
+        template = get_template(template_name)
+        source = getattr(getattr(template, 'template', template), 'source', '')
+        fingerprint = hashlib.md5(source.encode('utf-8')).hexdigest()
+        _template_fingerprints[template_name] = fingerprint
+    return fingerprint
+
+
+_template_fingerprints = {}
+
+
+class FragmentCacheMixin:
+    """
+    Cache the rendered HTML of a block until one of its dependencies changes.
+
+    Blocks list the models they read in ``Meta.fragment_dependencies``;
+    publishing, unpublishing or deleting any instance of those models evicts
+    the cached HTML. Blocks whose HTML only depends on their value (text,
+    images, calls to action) set ``Meta.fragment_cache = True`` instead, and a
+    subclass can opt out again with ``fragment_cache = False``.
+
+    The key is a hash of the raw block value, the template source and the
+    language, and the entry also depends on every page and image the value
+    references (chooser fields and rich text links), so publishing one of
+    those re-renders the blocks linking to it. Override
+    get_fragment_cache_key_parts() when the output also depends on something
+    other than the block value.
+    """
+    def get_fragment_cache_key_parts(self, value, context):
+        return []
+
+    def get_fragment_dependencies(self, value):
+        return [
+            *getattr(self.meta, 'fragment_dependencies', []),
+            *{
+                fragment_cache.reference_dependency_key(model, object_id)
+                for model, object_id, _, _ in self.extract_references(value)
+            },
+            fragment_cache.PAGE_URLS,
+        ]
+
+    def render(self, value, context=None):
+        enabled = getattr(self.meta, 'fragment_cache', None)
+        if enabled is None:
+            enabled = bool(getattr(self.meta, 'fragment_dependencies', None))
+        request = context.get('request') if context else None
+        if not enabled or request is None or getattr(request, 'is_preview', False):
+            return super().render(value, context=context)
+
+        key = fragment_cache.make_key(
+            self.__class__.__name__,
+            template_fingerprint(self.get_template(value, context)),
+            request.get_host(),
+            translation.get_language(),
+            self.get_prep_value(value),
+            # templates use the stream child id for element ids
+            getattr(context.get('block'), 'id', None),
+            self.get_fragment_cache_key_parts(value, context),
+        )
+        render = super().render
+        return mark_safe(fragment_cache.get_or_set(
+            key,
+            self.get_fragment_dependencies(value),
+            lambda: render(value, context=context),
+        ))
+
+
+class TextBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.TextBlock):
     """
     A block that displays a text section.
     """
@@ -32,11 +132,13 @@ class TextBlock(blocks.TextBlock):
 
     class Meta:
         template = "blocks/text_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "pilcrow"
         group = "Standalone Blocks"
 
 
-class RichTextBlock(blocks.RichTextBlock):
+class RichTextBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.RichTextBlock):
     """
     A block that displays a rich text section.
     """
@@ -56,11 +158,13 @@ class RichTextBlock(blocks.RichTextBlock):
 
     class Meta:
         template = "blocks/rich_text_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "pilcrow"
         group = "Standalone Blocks"
 
 
-class RawHTMLBlock(blocks.RawHTMLBlock):
+class RawHTMLBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.RawHTMLBlock):
     """
     A block that allows raw HTML input.
 
@@ -82,23 +186,27 @@ class RawHTMLBlock(blocks.RawHTMLBlock):
 
     class Meta:
         template = "blocks/raw_html_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "code"
         group = "Standalone Blocks"
 
 
-class SixPhilosophiesBlock(blocks.StaticBlock):
+class SixPhilosophiesBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StaticBlock):
     """
     A block that displays a static block showing the six philosophies.
     """
     class Meta:
         template = "blocks/six_philosophies_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "info-circle"
         admin_text = "AYSO six philosophies"
         label = "AYSO 6 philosophies"
         group = "Standalone Blocks"
 
 
-class CallToActionBlock(blocks.StructBlock):
+class CallToActionBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays a call to action section with optional image.
     """
@@ -156,10 +264,12 @@ class CallToActionBlock(blocks.StructBlock):
 
     class Meta:
         template = "blocks/call_to_action_1.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "expand-right"
 
 
-class CTATextBlock(blocks.StructBlock):
+class CTATextBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays a CTA section.
     """
@@ -184,10 +294,12 @@ class CTATextBlock(blocks.StructBlock):
 
     class Meta:
         template = "blocks/cta_text_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "expand-right"
 
 
-class ImageBlock(ImageChooserBlock):
+class ImageBlock(InstrumentedBlockMixin, FragmentCacheMixin, ImageChooserBlock):
     """
     A block that displays an image.
     """
@@ -200,19 +312,15 @@ class ImageBlock(ImageChooserBlock):
             "height": value.height,
         }
 
-    def get_context(self, value, parent_context=None):
-        from news.models import NewsItem
-        context = super().get_context(value, parent_context=parent_context)
-        context["news_items"] = NewsItem.objects.all().live().public()
-        return context
-
     class Meta:
         template = "blocks/image_block.html"
+        # the HTML only depends on the value
+        fragment_cache = True
         icon = "image"
         group = "Standalone Blocks"
 
 
-class RecentNewsBlock(blocks.StructBlock):
+class RecentNewsBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays recent news items with optional tag filtering.
     """
@@ -241,18 +349,15 @@ class RecentNewsBlock(blocks.StructBlock):
 
     def get_context(self, value, parent_context=None):
         from news.models import NewsItem
-        from wagtail.models import Locale
 
         context = super().get_context(value, parent_context=parent_context)
+        loader = BlockDataLoader.for_context(parent_context)
 
         # Get the current locale if in a request context
-        try:
-            current_locale = Locale.get_active()
-        except (AttributeError, RuntimeError):
-            current_locale = None
+        current_locale = loader.get_active_locale()
 
-        # Start with base queryset
-        news_items = NewsItem.objects.live().public()
+        # Start with base queryset, only the columns the cards use
+        news_items = NewsItem.listing_queryset()
 
         # Filter by locale if available
         if current_locale:
@@ -272,20 +377,29 @@ class RecentNewsBlock(blocks.StructBlock):
         num_items = value.get('num_items', 3)
         news_items = news_items.order_by('-first_published_at')[:num_items]
 
-        context['news_items'] = news_items
+        request = parent_context.get('request') if parent_context else None
+        context['news_items'] = set_listing_urls(loader.fetch(news_items), request)
+        RenditionManifest.for_request(request).prefetch(context['news_items'], self.meta.rendition_specs)
+        richtext.set_rendered(context['news_items'], 'intro')
         context['tag'] = tag
 
         return context
 
+    def get_fragment_cache_key_parts(self, value, context):
+        return [context.get('current_page_id')]
+
     class Meta:
         # template = "blocks/recent_news_block.html"
         template = "blocks/recent_news_carousel.html"
+        fragment_dependencies = ['model:news.newsitem']
+        # image renditions the template renders, prefetched for all the items
+        rendition_specs = ['fill-600x192']
         icon = "doc-full-inverse"
         label = "Recent News"
         group = "Standalone Blocks"
 
 
-class ProgramsBlock(blocks.StructBlock):
+class ProgramsBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays all available programs.
     """
@@ -303,35 +417,38 @@ class ProgramsBlock(blocks.StructBlock):
 
     def get_context(self, value, parent_context=None):
         from programs.models import Program
-        from wagtail.models import Locale
 
         context = super().get_context(value, parent_context=parent_context)
+        loader = BlockDataLoader.for_context(parent_context)
 
         # Get the current locale if in a request context
-        try:
-            current_locale = Locale.get_active()
-        except (AttributeError, RuntimeError):
-            current_locale = None
+        current_locale = loader.get_active_locale()
 
-        # Get all live, published programs
-        programs = Program.objects.live().public()
+        # Get all live, published programs, only the columns the cards use
+        programs = Program.listing_queryset()
 
         # Filter by locale if available
         if current_locale:
             programs = programs.filter(locale=current_locale)
 
-        context['programs'] = programs
+        request = parent_context.get('request') if parent_context else None
+        context['programs'] = set_listing_urls(loader.fetch(programs), request)
+        RenditionManifest.for_request(request).prefetch(
+            context['programs'], self.meta.rendition_specs, field_name='logo'
+        )
 
         return context
 
     class Meta:
         template = "blocks/programs_block.html"
+        fragment_dependencies = ['model:programs.program']
+        rendition_specs = ['height-150']
         icon = "list-ul"
         label = "Programs List"
         group = "Standalone Blocks"
 
 
-class UpcomingEventsBlock(blocks.StructBlock):
+class UpcomingEventsBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays upcoming events with optional filtering by type.
     """
@@ -385,37 +502,53 @@ class UpcomingEventsBlock(blocks.StructBlock):
 
     def get_context(self, value, parent_context=None):
         from events.models import Event
-        from django.utils import timezone
+        from events.upcoming import get_upcoming_events
 
         context = super().get_context(value, parent_context=parent_context)
 
-        events = Event.objects.filter(live=True)
-
-        if not value.get('show_past_events', False):
-            events = events.filter(start_date__gte=timezone.now().date())
-
         event_type = value.get('filter_by_type', '').strip()
-        if event_type:
-            events = events.filter(event_type=event_type)
-
         status = value.get('filter_by_status', '').strip()
-        if status:
-            events = events.filter(status=status)
-
         num_items = value.get('num_items', 5)
-        events = events.order_by('start_date')[:num_items]
 
-        context['events'] = events
+        if value.get('show_past_events', False):
+            events = Event.objects.filter(live=True)
+            if event_type:
+                events = events.filter(event_type=event_type)
+            if status:
+                events = events.filter(status=status)
+            events = events.order_by('start_date')[:num_items]
+            context['events'] = BlockDataLoader.for_context(parent_context).fetch(events)
+        else:
+            # upcoming events come from the daily snapshot, no query needed
+            context['events'] = [
+                event for event in get_upcoming_events().starting
+                if (not event_type or event.event_type == event_type)
+                and (not status or event.status == status)
+            ][:num_items]
         return context
 
+    def get_fragment_cache_key_parts(self, value, context):
+        # past events drop off at the date rollover
+        return [timezone.now().date()]
+
     class Meta:
         template = "blocks/upcoming_events_block.html"
+        fragment_dependencies = ['model:events.event']
         icon = "date"
         label = "Upcoming Events"
         group = "Standalone Blocks"
 
 
-class CustomPageChooserBlock(blocks.PageChooserBlock):
+class TableBlock(InstrumentedBlockMixin, FragmentCacheMixin, table_blocks.TableBlock):
+    """
+    A table, rendered with Wagtail's table template.
+    """
+    class Meta:
+        # the HTML only depends on the value
+        fragment_cache = True
+
+
+class CustomPageChooserBlock(InstrumentedBlockMixin, blocks.PageChooserBlock):
     """
     A block that displays a page chooser.
     """
@@ -424,11 +557,11 @@ class CustomPageChooserBlock(blocks.PageChooserBlock):
             "id": value.id,
             "title": value.title,
             "subtitle": value.specific.subtitle,
-            "url": value.url,
+            "url": page_urls.get_url(value, context.get("request") if context else None),
         }
 
 
-class FAQBlock(blocks.StructBlock):
+class FAQBlock(InstrumentedBlockMixin, FragmentCacheMixin, blocks.StructBlock):
     """
     A block that displays FAQ items with optional tag filtering.
 
@@ -495,7 +628,7 @@ class FAQBlock(blocks.StructBlock):
         if num_items > 0:
             faqs = faqs[:num_items]
 
-        context['faqs'] = faqs
+        context['faqs'] = richtext.set_rendered(BlockDataLoader.for_context(parent_context).fetch(faqs), 'answer')
         context['tag'] = tag
         context['category'] = category
         context['show_categories'] = value.get('show_categories', True)
@@ -504,19 +637,20 @@ class FAQBlock(blocks.StructBlock):
 
     class Meta:
         template = "blocks/faq_block.html"
+        fragment_dependencies = ['model:site_settings.faq']
         icon = "help"
         label = "FAQ List"
         group = "Standalone Blocks"
 
 
-class ResourcesNavigationBlock(blocks.StaticBlock):
+class ResourcesNavigationBlock(InstrumentedBlockMixin, blocks.StaticBlock):
     """
     A block that displays navigation for the Resources section.
     Shows all categories and pages within the current page's category.
     """
 
     def get_context(self, value, parent_context=None):
-        from flexpage.models import FlexPage, ResourcesIndex
+        from flexpage.models import ResourcesIndex
 
         context = super().get_context(value, parent_context=parent_context)
 
@@ -524,32 +658,33 @@ class ResourcesNavigationBlock(blocks.StaticBlock):
         current_page = parent_context.get('page') if parent_context else None
 
         if current_page:
+            loader = BlockDataLoader.for_context(parent_context)
+
             # Find the ResourcesIndex page (parent of all resource pages)
             resources_index = None
+            category_page = None
             if isinstance(current_page, ResourcesIndex):
                 resources_index = current_page
             else:
-                # Get the parent ResourcesIndex
-                resources_index = current_page.get_ancestors().type(ResourcesIndex).first()
+                # the ancestors in one query, the paths are prefixes of the page's own path
+                steplen = current_page.steplen
+                ancestors = loader.fetch(
+                    Page.objects.filter(
+                        path__in=[current_page.path[:end] for end in range(steplen, len(current_page.path), steplen)]
+                    ).specific(defer=True).order_by('path')
+                )
+                for i, ancestor in enumerate(ancestors):
+                    if isinstance(ancestor, ResourcesIndex):
+                        resources_index = ancestor
+                        # the category page is the next one down (direct child of ResourcesIndex)
+                        category_page = ancestors[i + 1] if i + 1 < len(ancestors) else current_page
+                        break
 
             if resources_index:
-                # Get the parent category page (direct child of ResourcesIndex)
-                category_page = None
-
-                # If current page is a direct child of ResourcesIndex, it's a category page
-                if current_page.get_parent() == resources_index:
-                    category_page = current_page
-                else:
-                    # Otherwise, find the category page (ancestor that's a direct child of ResourcesIndex)
-                    for ancestor in current_page.get_ancestors():
-                        if ancestor.get_parent() == resources_index:
-                            category_page = ancestor.specific
-                            break
-
                 # Get all sibling pages (children of the same category page)
                 sibling_pages = []
                 if category_page:
-                    sibling_pages = category_page.get_children().live().specific().order_by('title')
+                    sibling_pages = self.get_sibling_pages(category_page, parent_context, loader)
 
                 context['resources_index'] = resources_index
                 context['category_page'] = category_page
@@ -558,6 +693,25 @@ class ResourcesNavigationBlock(blocks.StaticBlock):
 
         return context
 
+    def get_sibling_pages(self, category_page, parent_context, loader):
+        """
+        The live children of `category_page`, cached per category page until one
+        of them is published, unpublished or deleted.
+        """
+        def load_sibling_pages():
+            return loader.fetch(
+                Page.objects.child_of(category_page).live().specific(defer=True).order_by('title')
+            )
+
+        request = parent_context.get('request')
+        if request is None or getattr(request, 'is_preview', False):
+            return load_sibling_pages()
+        return fragment_cache.get_or_set(
+            fragment_cache.make_key("resources-navigation-siblings", category_page.path),
+            [fragment_cache.children_dependency_key(category_page.path), fragment_cache.PAGE_URLS],
+            load_sibling_pages,
+        )
+
     class Meta:
         template = "blocks/resources_navigation_block.html"
         icon = "list-ul"
@@ -566,7 +720,7 @@ class ResourcesNavigationBlock(blocks.StaticBlock):
         group = "Standalone Blocks"
 
 
-class CTASnippetBlock(blocks.StructBlock):
+class CTASnippetBlock(InstrumentedBlockMixin, blocks.StructBlock):
     """
     A block that randomly selects and displays one CTA from a list of chosen CTA snippets.
 
@@ -583,6 +737,9 @@ class CTASnippetBlock(blocks.StructBlock):
         context = super().get_context(value, parent_context=parent_context)
         live_ctas = [cta for cta in (value.get("ctas") or []) if cta and getattr(cta, "live", True)]
         context["selected_cta"] = random.choice(live_ctas) if live_ctas else None
+        if len(live_ctas) > 1:
+            # keep the rotation going when the page is served from the full-page cache
+            page_cache.vary_randomly(context.get("request"))
         return context
 
     class Meta:
@@ -592,7 +749,7 @@ class CTASnippetBlock(blocks.StructBlock):
         group = "Standalone Blocks"
 
 
-class LayoutSectionBlock(blocks.StructBlock):
+class LayoutSectionBlock(InstrumentedBlockMixin, blocks.StructBlock):
     """
     A flexible layout block that allows choosing between full-width or content-with-sidebar layouts.
     Supports multiple sections per page with different layouts.
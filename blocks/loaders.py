@@ -0,0 +1,67 @@
+"""
+Request-scoped data loading for StreamField blocks.
+
+Several blocks on one page often ask for the same rows: a FlexPage with a few
+layout sections can render the programs list three or four times, each running
+"live programs in locale X" again. Blocks fetch their querysets through a
+BlockDataLoader instead, which runs each distinct query once per request and
+hands the same list of results to every block asking for it.
+"""
+from django.core.exceptions import EmptyResultSet
+
+from wagtail.models import Locale
+
+
+class BlockDataLoader:
+    """
+    Query results memoized for one request, keyed by model, compiled SQL and
+    result type, so only lookups with the same filters, ordering, limit and
+    (for pages) specific() flavour are shared.
+    """
+    def __init__(self):
+        self._results = {}
+        self._active_locale = None
+
+    @classmethod
+    def for_context(cls, context):
+        """
+        Return the loader attached to the request in a block's (parent) context,
+        creating it on first use. Without a request a fresh (unshared) loader is
+        returned.
+        """
+        request = context.get('request') if context else None
+        if request is None:
+            return cls()
+        try:
+            return request._block_data_loader
+        except AttributeError:
+            request._block_data_loader = cls()
+            return request._block_data_loader
+
+    def fetch(self, queryset):
+        """
+        Evaluate `queryset` and return its results as a list, or the list from an
+        identical earlier lookup in this request.
+        """
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            # e.g. filter(id__in=[]), no query needed
+            return []
+        # specific() changes the returned objects but not the SQL
+        key = (queryset.model._meta.label, queryset._iterable_class.__name__, sql, repr(params))
+        if key not in self._results:
+            self._results[key] = list(queryset)
+        return self._results[key]
+
+    def get_active_locale(self):
+        """
+        Locale.get_active(), looked up once per request. None outside of a
+        request/translation context.
+        """
+        if self._active_locale is None:
+            try:
+                self._active_locale = Locale.get_active()
+            except (AttributeError, RuntimeError, Locale.DoesNotExist):
+                return None
+        return self._active_locale
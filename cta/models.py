@@ -6,6 +6,8 @@ from wagtail.fields import RichTextField
 from wagtail.images import get_image_model
 from wagtail.search import index
 
+from site_settings import page_urls
+
 
 class CTA(
     PreviewableMixin,
@@ -105,6 +107,7 @@ class CTA(
         index.SearchField("title", boost=10),
         index.SearchField("heading", boost=5),
         index.SearchField("text"),
+        index.FilterField("live"),
     ]
 
     def __str__(self):
@@ -123,8 +126,9 @@ class CTA(
 
     def get_button_url(self):
         """Return the resolved button URL, preferring button_page over button_url."""
-        if self.button_page:
-            return self.button_page.url
+        if self.button_page_id:
+            # resolved from the page URL map, without loading the page
+            return page_urls.get_url(self.button_page_id)
         return self.button_url or ""
 
     def get_button_label(self):
@@ -0,0 +1,112 @@
+"""
+iCalendar (RFC 5545) serialization of events, for the calendar feeds on
+EventsPage.
+
+Calendar apps poll subscribed feeds often, so EventsPage keeps the serialized
+feed in the fragment cache and only calls serialize_calendar() again after an
+event or program is published.
+"""
+import datetime
+
+from django.utils import timezone
+
+
+PRODID = "-//AYSO Region 418//Events//EN"
+
+# RFC 5545 3.1: lines longer than 75 octets are folded
+MAX_LINE_OCTETS = 75
+
+
+def escape_text(value):
+    """
+    Escape a TEXT property value (RFC 5545 3.3.11).
+    """
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """
+    Split `line` into CRLF-terminated chunks of at most 75 octets, continuation
+    lines starting with a space. Never splits a UTF-8 character.
+    """
+    chunks = []
+    chunk = ""
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        if len((chunk + char).encode("utf-8")) > limit:
+            chunks.append(chunk)
+            chunk = " "
+            limit = MAX_LINE_OCTETS
+        chunk += char
+    chunks.append(chunk)
+    return "".join(f"{chunk}\r\n" for chunk in chunks)
+
+
+def format_date(value):
+    return value.strftime("%Y%m%d")
+
+
+def format_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def iter_vevents(events, host, default_url):
+    """
+    Yield the folded lines of one VEVENT per event.
+    """
+    now = timezone.now()
+    for event in events:
+        # all-day events; DTEND is exclusive
+        end_date = (event.end_date or event.start_date) + datetime.timedelta(days=1)
+
+        description = []
+        if event.subtitle:
+            description.append(event.subtitle)
+        description.append(f"Status: {event.get_status_display()}")
+        if event.program:
+            description.append(f"Program: {event.program.title}")
+        if event.reg_start or event.reg_end:
+            registration = " – ".join(
+                f"{date:%B} {date.day}, {date.year}" for date in (event.reg_start, event.reg_end) if date
+            )
+            description.append(f"Registration: {registration}")
+        description = escape_text("\n".join(description))
+
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:event-{event.pk}@{host}",
+            f"DTSTAMP:{format_datetime(event.last_published_at or now)}",
+            f"DTSTART;VALUE=DATE:{format_date(event.start_date)}",
+            f"DTEND;VALUE=DATE:{format_date(end_date)}",
+            f"SUMMARY:{escape_text(event.title)}",
+            f"DESCRIPTION:{description}",
+            f"CATEGORIES:{escape_text(event.get_event_type_display())}",
+            f"URL:{event.link or default_url}",
+            "END:VEVENT",
+        ]
+        yield from (fold_line(line) for line in lines)
+
+
+def serialize_calendar(events, name, host, default_url):
+    """
+    Return the VCALENDAR holding `events` as UTF-8 bytes.
+    """
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+    ]
+    parts = [fold_line(line) for line in header]
+    parts.extend(iter_vevents(events, host, default_url))
+    parts.append(fold_line("END:VCALENDAR"))
+    return "".join(parts).encode("utf-8")
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_reg_end_event_reg_start'),
+        ('programs', '0001_initial'),
+        ('wagtailcore', '0096_referenceindex_referenceindex_source_object_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['live', 'end_date', 'start_date'], name='event_live_end_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['live', 'event_type', 'start_date'], name='event_live_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['program', 'live', 'end_date'], name='event_program_live_end_idx'),
+        ),
+    ]
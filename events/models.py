@@ -1,6 +1,11 @@
+import calendar
+import hashlib
+
 from django.db import models
 from django.contrib.contenttypes.fields import GenericRelation
-from django.utils import timezone
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from modelcluster.models import ClusterableModel
 
@@ -11,6 +16,10 @@ from wagtail.fields import StreamField
 from wagtail.contrib.routable_page.models import RoutablePageMixin, path
 
 from blocks import blocks as custom_blocks
+from events.calendar import serialize_calendar
+from events.upcoming import get_upcoming_events
+from site_settings import cache as fragment_cache
+from site_settings import page_urls
 
 
 class Event(
@@ -125,6 +134,7 @@ class Event(
         index.FilterField("event_type"),
         index.FilterField("status"),
         index.FilterField("start_date"),
+        index.FilterField("live"),
     ]
 
     def __str__(self):
@@ -137,9 +147,15 @@ class Event(
         verbose_name = "Event"
         verbose_name_plural = "Events"
         ordering = ["start_date", "title"]
+        indexes = [
+            # upcoming events, by type and by program
+            models.Index(fields=["live", "end_date", "start_date"], name="event_live_end_start_idx"),
+            models.Index(fields=["live", "event_type", "start_date"], name="event_live_type_start_idx"),
+            models.Index(fields=["program", "live", "end_date"], name="event_program_live_end_idx"),
+        ]
 
 
-class EventsPage(RoutablePageMixin, Page):
+class EventsPage(RoutablePageMixin, page_urls.SitemapUrlsMixin, Page):
     max_count = 1
     subpage_types = []
 
@@ -151,21 +167,14 @@ class EventsPage(RoutablePageMixin, Page):
     template = "events/events_page.html"
 
     def _get_events(self, event_type=None):
-        events = Event.objects.filter(
-            live=True,
-            end_date__gte=timezone.now().date(),
-        ).select_related('program')
+        upcoming = get_upcoming_events()
         if event_type:
-            events = events.filter(event_type=event_type)
-        return events.order_by('start_date')
+            return upcoming.current_by_type.get(event_type, [])
+        return upcoming.current
 
     def _get_event_types_in_use(self):
         """Get event types that have at least one upcoming published event."""
-        type_values = (
-            Event.objects.filter(live=True, end_date__gte=timezone.now().date())
-            .values_list('event_type', flat=True)
-            .distinct()
-        )
+        type_values = get_upcoming_events().current_by_type
         type_map = dict(Event.EVENT_TYPE_CHOICES)
         return [(val, type_map[val]) for val in type_values if val in type_map]
 
@@ -188,3 +197,98 @@ class EventsPage(RoutablePageMixin, Page):
                 'active_type_label': type_map.get(event_type, event_type),
             },
         )
+
+    # /events/calendar/
+    @path("calendar/", name="calendar")
+    def calendar(self, request):
+        """
+        iCalendar feed of all published events, for calendar app subscriptions.
+
+        Served as calendar/ rather than calendar.ics: Wagtail only routes paths
+        made of slug-like segments ending in a slash.
+        """
+        return self._serve_calendar(request, self.title)
+
+    # /events/type/registration/calendar/
+    @path("type/<str:event_type>/calendar/", name="type_calendar")
+    def type_calendar(self, request, event_type):
+        type_map = dict(Event.EVENT_TYPE_CHOICES)
+        if event_type not in type_map:
+            raise Http404
+        return self._serve_calendar(
+            request, f"{self.title}: {type_map[event_type]}", event_type=event_type
+        )
+
+    # /events/program/12/calendar/
+    @path("program/<int:program_id>/calendar/", name="program_calendar")
+    def program_calendar(self, request, program_id):
+        return self._serve_calendar(request, None, program_id=program_id)
+
+    def _serve_calendar(self, request, name, event_type=None, program_id=None):
+        """
+        Serve an iCalendar feed with an ETag and a Last-Modified based on the
+        most recently published event in it.
+
+        The serialized feed is cached until an event or program is published,
+        unpublished or deleted, so polling clients neither query the database
+        nor re-serialize the feed, and get a 304 when they already have it.
+        """
+        def build_feed():
+            return self._build_calendar_feed(request, name, event_type, program_id)
+
+        if getattr(request, 'is_preview', False):
+            feed = build_feed()
+        else:
+            feed = fragment_cache.get_or_set(
+                fragment_cache.make_key(
+                    "events-calendar", request.get_host(), self.pk, event_type, program_id
+                ),
+                [Event, 'model:programs.program', fragment_cache.PAGE_URLS],
+                build_feed,
+            )
+        if feed is None:
+            raise Http404
+
+        etag, last_modified, content = feed
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = HttpResponse(content, content_type="text/calendar; charset=utf-8")
+        response.headers["ETag"] = etag
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        response.headers["Content-Disposition"] = 'inline; filename="calendar.ics"'
+        return response
+
+    def _build_calendar_feed(self, request, name, event_type, program_id):
+        """
+        Return (etag, last_modified, content) for a feed, or None for a program
+        that doesn't exist.
+        """
+        from programs.models import Program
+
+        events = (
+            Event.objects.filter(live=True)
+            .select_related('program')
+            .defer('body')
+            .order_by('start_date', 'title')
+        )
+        if event_type:
+            events = events.filter(event_type=event_type)
+        if program_id is not None:
+            program = Program.objects.live().public().filter(id=program_id).only('title').first()
+            if program is None:
+                return None
+            events = events.filter(program=program)
+            name = f"{self.title}: {program.title}"
+
+        events = list(events)
+        content = serialize_calendar(
+            events, name, request.get_host(), self.get_full_url(request) or ""
+        )
+        published = [event.last_published_at for event in events if event.last_published_at]
+        # whole seconds, like the parsed If-Modified-Since it's compared with
+        last_modified = calendar.timegm(max(published).utctimetuple()) if published else None
+        etag = quote_etag(hashlib.md5(content).hexdigest())
+        return etag, last_modified, content
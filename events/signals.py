@@ -0,0 +1,38 @@
+"""
+Signal receivers that rebuild the upcoming events snapshot. Connected in
+EventsConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+    published,
+    unpublished,
+)
+
+from events.models import Event
+from events.upcoming import publish_snapshot
+from programs.models import Program
+
+
+def events_changed(sender, instance, **kwargs):
+    """
+    Rebuild the snapshot once an event, or a program shown next to its events,
+    is published, unpublished, moved or deleted.
+    """
+    if isinstance(instance, (Event, Program)):
+        transaction.on_commit(publish_snapshot)
+
+
+def register_signal_handlers():
+    published.connect(events_changed, sender=Event)
+    unpublished.connect(events_changed, sender=Event)
+    post_delete.connect(events_changed, sender=Event)
+    page_published.connect(events_changed, sender=Program)
+    page_unpublished.connect(events_changed, sender=Program)
+    post_page_move.connect(events_changed)
+    page_slug_changed.connect(events_changed)
+    post_delete.connect(events_changed, sender=Program)
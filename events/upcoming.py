@@ -0,0 +1,111 @@
+"""
+Per-day snapshot of the upcoming events.
+
+The events page, its type filters, program pages and the Upcoming Events block
+all list live events that haven't ended (or started) yet. Instead of each of
+them querying ``Event``, the upcoming events are loaded once per day into a
+snapshot grouped by type and by program, which is kept in the cache and in
+every worker process, like the banner snapshot.
+
+The snapshot is rebuilt when the date rolls over and whenever an event (or a
+program events link to) is published, unpublished, moved or deleted.
+"""
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+
+UpcomingEvents = namedtuple(
+    "UpcomingEvents",
+    [
+        "date",
+        # events that haven't ended yet (end_date >= date), by start date
+        "current",
+        # the same, grouped by event_type and by program id
+        "current_by_type",
+        "current_by_program",
+        # events starting on or after the date, by start date
+        "starting",
+    ],
+)
+
+VERSION_CACHE_KEY = "upcoming-events:version"
+SNAPSHOT_CACHE_KEY = "upcoming-events:snapshot"
+
+# (version, snapshot) held by this process
+_process_snapshot = (None, None)
+
+
+def build_snapshot(date):
+    """
+    Load the live events that haven't ended or started by `date`.
+    """
+    from events.models import Event
+
+    events = list(
+        Event.objects.filter(live=True)
+        .filter(Q(end_date__gte=date) | Q(start_date__gte=date))
+        .select_related("program")
+        .order_by("start_date", "title")
+    )
+
+    current = [event for event in events if event.end_date is not None and event.end_date >= date]
+    current_by_type = {}
+    current_by_program = {}
+    for event in current:
+        current_by_type.setdefault(event.event_type, []).append(event)
+        if event.program_id is not None:
+            current_by_program.setdefault(event.program_id, []).append(event)
+
+    return UpcomingEvents(
+        date=date,
+        current=current,
+        current_by_type=current_by_type,
+        current_by_program=current_by_program,
+        starting=[event for event in events if event.start_date >= date],
+    )
+
+
+def publish_snapshot():
+    """
+    Rebuild today's snapshot and share it with every process.
+    """
+    global _process_snapshot
+
+    version = uuid.uuid4().hex
+    snapshot = build_snapshot(timezone.now().date())
+    cache.set(SNAPSHOT_CACHE_KEY, (version, snapshot), timeout=None)
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    _process_snapshot = (version, snapshot)
+
+
+def get_upcoming_events():
+    """
+    Return today's UpcomingEvents snapshot.
+    """
+    global _process_snapshot
+
+    today = timezone.now().date()
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is not None and version == _process_snapshot[0] and _process_snapshot[1].date == today:
+        return _process_snapshot[1]
+
+    cached = cache.get(SNAPSHOT_CACHE_KEY)
+    if cached is None or cached[1].date != today:
+        # cold cache, or the first request of the day
+        fresh = (uuid.uuid4().hex, build_snapshot(today))
+        if cached is None:
+            # don't overwrite a snapshot written by a concurrent publish
+            if not cache.add(SNAPSHOT_CACHE_KEY, fresh, timeout=None):
+                fresh = cache.get(SNAPSHOT_CACHE_KEY, fresh)
+        else:
+            cache.set(SNAPSHOT_CACHE_KEY, fresh, timeout=None)
+        cached = fresh
+
+    if version != cached[0]:
+        cache.set(VERSION_CACHE_KEY, cached[0], timeout=None)
+    _process_snapshot = cached
+    return cached[1]
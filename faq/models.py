@@ -6,10 +6,11 @@ from wagtail.contrib.routable_page.models import RoutablePageMixin, path
 
 from taggit.models import Tag
 
+from site_settings import page_urls, richtext
 from site_settings.models import FAQ
 
 
-class FAQPage(RoutablePageMixin, Page):
+class FAQPage(RoutablePageMixin, page_urls.SitemapUrlsMixin, Page):
     max_count = 1
     parent_page_types = ['flexpage.ResourcesIndex']
     subpage_types = []
@@ -30,11 +31,12 @@ class FAQPage(RoutablePageMixin, Page):
         )
 
     def _get_faqs(self, tag=None):
-        """Get published FAQs, optionally filtered by tag."""
+        """Get published FAQs, optionally filtered by tag, with their answers rendered."""
         faqs = FAQ.objects.filter(live=True).select_related('category')
         if tag:
             faqs = faqs.filter(tags__name=tag)
-        return faqs.order_by('category__order', 'category__name', 'order', 'question')
+        faqs = faqs.order_by('category__order', 'category__name', 'order', 'question')
+        return richtext.set_rendered(list(faqs), 'answer')
 
     def get_context(self, request):
         context = super().get_context(request)
@@ -0,0 +1,167 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from wagtail.models import Site
+
+from blocks.blocks import ResourcesNavigationBlock
+from flexpage.models import FlexPage, ResourcesIndex
+
+
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark-resources-navigation",
+    },
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_navigation(current_page):
+    """
+    The navigation context as it was built before the lookup used path
+    arithmetic: one get_parent() query per ancestor, for comparison.
+    """
+    resources_index = current_page.get_ancestors().type(ResourcesIndex).first()
+    category_page = None
+    if current_page.get_parent() == resources_index:
+        category_page = current_page
+    else:
+        for ancestor in current_page.get_ancestors():
+            if ancestor.get_parent() == resources_index:
+                category_page = ancestor.specific
+                break
+    return {
+        "resources_index": resources_index,
+        "category_page": category_page,
+        "sibling_pages": list(category_page.get_children().live().specific().order_by("title")),
+        "current_page": current_page,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a throwaway resources tree (a ResourcesIndex and its category pages "
+        "and subpages) under the default site and measure the queries and time "
+        "the Resources Navigation block costs on each page of it. Nothing is "
+        "kept: the tree is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=200,
+            help="Number of pages below the ResourcesIndex",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=4,
+            help="Levels in the tree, counting the ResourcesIndex",
+        )
+        parser.add_argument(
+            "--branching",
+            type=int,
+            default=6,
+            help="Children per page on the levels above the last one",
+        )
+
+    def handle(self, *args, **options):
+        if options["depth"] < 3:
+            raise CommandError("--depth must be at least 3 (index, categories and their pages).")
+
+        site = Site.objects.filter(is_default_site=True).select_related("root_page").first()
+        if site is None:
+            raise CommandError("No default site found.")
+
+        # DummyCache (the dev default) would make every lookup a miss
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            try:
+                with transaction.atomic():
+                    created = self.build_tree(site.root_page, options)
+                    # fresh instances, like the ones Wagtail serves (add_child() caches the parent)
+                    pages = list(FlexPage.objects.filter(id__in=[page.id for page in created]).order_by("path"))
+                    self.stdout.write(
+                        f"Built a tree of {len(pages)} pages, {options['depth']} levels deep."
+                    )
+                    self.run_benchmark(site, pages)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def build_tree(self, site_root, options):
+        resources_index = site_root.add_child(
+            instance=ResourcesIndex(title="Benchmark resources", slug=f"benchmark-resources-{time.time_ns()}")
+        )
+        pages = []
+        level = [resources_index]
+        for depth in range(2, options["depth"] + 1):
+            remaining = options["pages"] - len(pages)
+            if depth == options["depth"]:
+                # spread the rest of the pages over the last level
+                share, extra = divmod(remaining, len(level))
+                counts = [share + (i < extra) for i in range(len(level))]
+            else:
+                counts = [options["branching"]] * len(level)
+
+            next_level = []
+            for parent, count in zip(level, counts):
+                for i in range(min(count, remaining - len(next_level))):
+                    next_level.append(parent.add_child(
+                        instance=FlexPage(title=f"{parent.title} / {i}", slug=f"page-{i}")
+                    ))
+            pages.extend(next_level)
+            level = next_level
+        return pages
+
+    def run_benchmark(self, site, pages):
+        block = ResourcesNavigationBlock()
+        factory = RequestFactory()
+
+        def new_request():
+            request = factory.get("/", HTTP_HOST=site.hostname)
+            request.user = AnonymousUser()
+            request._wagtail_site = site
+            return request
+
+        # both render the block's template, so only the context building differs
+        def render_legacy(page):
+            render_to_string(block.meta.template, {**legacy_navigation(page), "request": new_request()})
+
+        def render_block(page):
+            block.render(None, {"page": page, "request": new_request()})
+
+        for label, render, cold in [
+            ("per-ancestor get_parent() (before)", render_legacy, False),
+            ("path arithmetic, cold cache", render_block, True),
+            ("path arithmetic, warm cache", render_block, False),
+        ]:
+            if not cold:
+                # untimed pass: compiled templates, and the cached siblings of every category
+                for page in pages:
+                    render(page)
+
+            queries = []
+            elapsed = 0.0
+            for page in pages:
+                if cold:
+                    cache.clear()
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    render(page)
+                elapsed += time.perf_counter() - start
+                queries.append(len(captured))
+            self.stdout.write(
+                f"{label}: {sum(queries) / len(queries):.1f} queries per page "
+                f"(max {max(queries)}), {elapsed / len(pages) * 1000:.2f} ms per page"
+            )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:22
+
+import wagtail.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flexpage', '0005_alter_flexpage_body_alter_flexpage_callouts_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='flexpage',
+            name='body',
+            field=wagtail.fields.StreamField([('layout_section', 40)], blank=True, block_lookup={0: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('full_width', 'Full Width'), ('sidebar', 'Content with Right Sidebar')], 'help_text': 'Choose the layout for this section'}), 1: ('blocks.blocks.SixPhilosophiesBlock', (), {}), 2: ('blocks.blocks.TextBlock', (), {}), 3: ('blocks.blocks.RichTextBlock', (), {}), 4: ('blocks.blocks.ImageBlock', (), {}), 5: ('wagtail.blocks.RichTextBlock', (), {'features': ['bold', 'italic'], 'help_text': 'The main CTA text content', 'required': True}), 6: ('wagtail.blocks.PageChooserBlock', (), {'help_text': 'Page for the button to link to', 'required': False}), 7: ('wagtail.blocks.CharBlock', (), {'help_text': 'Button text (defaults to page title if empty)', 'max_length': 100, 'required': False}), 8: ('wagtail.blocks.PageChooserBlock', (), {'help_text': 'Optional: Make the entire CTA clickable by selecting a target page', 'required': False}), 9: ('wagtail.images.blocks.ImageChooserBlock', (), {'help_text': 'Optional image for the CTA', 'required': False}), 10: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('background', 'Background - Image fills entire CTA as background'), ('left', 'Left - Image on left, text on right'), ('right', 'Right - Image on right, text on left')], 'help_text': 'How to display the image', 'required': False}), 11: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('fill', 'Fill - Image fills entire section'), ('framed', 'Framed - Image with rounded edges and padding')], 'help_text': 'Style for left/right images (not used for background)', 'required': False}), 12: ('wagtail.blocks.StructBlock', [[('text', 5), ('page', 6), ('button_text', 7), ('target_url', 8), ('image', 9), ('image_layout', 10), ('image_style', 11)]], {}), 13: ('wagtail.snippets.blocks.SnippetChooserBlock', ('cta.CTA',), {}), 14: ('wagtail.blocks.ListBlock', (13,), {'help_text': 'Select one or more CTAs. A random live one will be displayed each page load.', 'min_num': 1}), 15: ('wagtail.blocks.StructBlock', [[('ctas', 14)]], {}), 16: ('wagtail.blocks.CharBlock', (), {'default': 'Frequently Asked Questions', 'help_text': 'Main heading for this FAQ section', 'max_length': 100, 'required': True}), 17: ('wagtail.blocks.TextBlock', (), {'help_text': 'Optional description text', 'max_length': 200, 'required': False}), 18: ('wagtail.blocks.CharBlock', (), {'help_text': 'Optional: filter FAQs by tag (leave blank to show all)', 'max_length': 50, 'required': False}), 19: ('wagtail.blocks.CharBlock', (), {'help_text': 'Optional: filter FAQs by category (leave blank to show all)', 'max_length': 100, 'required': False}), 20: ('wagtail.blocks.IntegerBlock', (), {'default': 0, 'help_text': 'Number of FAQs to display (0 = show all matching items)', 'max_value': 50, 'min_value': 0, 'required': True}), 21: ('wagtail.blocks.BooleanBlock', (), {'default': True, 'help_text': 'Display category labels for each FAQ', 'required': False}), 22: ('wagtail.blocks.StructBlock', [[('title', 16), ('subtitle', 17), ('filter_by_tag', 18), ('filter_by_category', 19), ('num_items', 20), ('show_categories', 21)]], {}), 23: ('blocks.blocks.TableBlock', (), {'help_text': 'Right click on table to access more options'}), 24: ('wagtail.blocks.CharBlock', (), {'help_text': 'Main heading for this news section', 'max_length': 100, 'required': True}), 25: ('wagtail.blocks.IntegerBlock', (), {'default': 3, 'help_text': 'Number of recent news items to display', 'max_value': 10, 'min_value': 1, 'required': True}), 26: ('wagtail.blocks.CharBlock', (), {'help_text': 'Optional: filter news items by tag (leave blank to show all)', 'max_length': 50, 'required': False}), 27: ('wagtail.blocks.StructBlock', [[('title', 24), ('subtitle', 17), ('num_items', 25), ('filter_by_tag', 26)]], {}), 28: ('wagtail.blocks.CharBlock', (), {'default': 'Our Programs', 'help_text': 'Main heading for this programs section', 'max_length': 100, 'required': True}), 29: ('wagtail.blocks.StructBlock', [[('title', 28), ('subtitle', 17)]], {}), 30: ('wagtail.blocks.CharBlock', (), {'default': 'Upcoming Events', 'help_text': 'Main heading for this events section', 'max_length': 100, 'required': True}), 31: ('wagtail.blocks.IntegerBlock', (), {'default': 5, 'help_text': 'Maximum number of events to display', 'max_value': 20, 'min_value': 1, 'required': True}), 32: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('', 'All Types'), ('registration', 'Registration'), ('referee_training', 'Referee Training'), ('coach_certification', 'Coach Certification'), ('training_camp', 'Training Camp'), ('special_event', 'Special Event'), ('other', 'Other')], 'help_text': 'Optional: show only events of this type', 'required': False}), 33: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('', 'All Statuses'), ('pending', 'Pending'), ('active', 'Active'), ('waitlist', 'Waitlist'), ('closed', 'Closed')], 'help_text': 'Optional: show only events with this status', 'required': False}), 34: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'help_text': 'Include events whose start date has passed', 'required': False}), 35: ('wagtail.blocks.StructBlock', [[('title', 30), ('subtitle', 17), ('num_items', 31), ('filter_by_type', 32), ('filter_by_status', 33), ('show_past_events', 34)]], {}), 36: ('blocks.blocks.RawHTMLBlock', (), {}), 37: ('wagtail.blocks.StreamBlock', [[('six', 1), ('text', 2), ('richtext', 3), ('image', 4), ('call_to_action_1', 12), ('cta_snippet', 15), ('faq', 22), ('table', 23), ('recent_news', 27), ('programs', 29), ('upcoming_events', 35), ('raw_html', 36)]], {'help_text': 'Main content for this section', 'required': False}), 38: ('wagtail.blocks.StreamBlock', [[('text', 2), ('richtext', 3), ('image', 4), ('call_to_action_1', 12), ('recent_news', 27)]], {'help_text': "Sidebar content (only shown when layout is 'Content with Right Sidebar')", 'required': False}), 39: ('wagtail.blocks.BooleanBlock', (), {'default': False, 'help_text': "Show Resources Navigation in the sidebar (only applies when layout is 'Content with Right Sidebar')", 'required': False}), 40: ('wagtail.blocks.StructBlock', [[('layout', 0), ('content', 37), ('sidebar', 38), ('show_resources_nav', 39)]], {})}, null=True),
+        ),
+    ]
@@ -7,11 +7,13 @@ from wagtail.admin.panels import FieldPanel
 from wagtail.images import get_image_model
 
 from blocks import blocks as custom_blocks
+from site_settings import cache as fragment_cache
+from site_settings import page_urls
 
 # Create your models here.
 
 
-class ResourcesIndex(Page):
+class ResourcesIndex(page_urls.SitemapUrlsMixin, Page):
     """
     Index page for the Resources section.
     """
@@ -56,24 +58,50 @@ class ResourcesIndex(Page):
 
     def get_context(self, request):
         context = super().get_context(request)
+        context['categories_with_children'] = self.get_categories_with_children(request)
+        return context
 
-        # Get direct children (category pages) of ResourcesIndex
-        category_pages = self.get_children().live().specific()
+    def get_categories_with_children(self, request):
+        """
+        The live category pages (direct children) with their live child pages,
+        cached until a page anywhere below the index is published, unpublished,
+        deleted or moved.
+        """
+        if getattr(request, 'is_preview', False):
+            return self._build_categories_with_children()
+        return fragment_cache.get_or_set(
+            fragment_cache.make_key("resources-index-categories", self.path),
+            [fragment_cache.subtree_dependency_key(self.path), fragment_cache.PAGE_URLS],
+            self._build_categories_with_children,
+        )
+
+    def _build_categories_with_children(self):
+        # both levels in one query; specific() then loads the specific pages
+        # with one query per page type for the whole tree
+        pages = (
+            Page.objects.descendant_of(self)
+            .filter(depth__lte=self.depth + 2)
+            .live()
+            .order_by('path')
+            .specific()
+        )
 
         # Build a list of categories with their child pages
         categories_with_children = []
-        for category_page in category_pages:
-            # Get the children of each category page
-            child_pages = category_page.get_children().live().specific()
-            categories_with_children.append({
-                'category_page': category_page,
-                'child_pages': child_pages
-            })
-
-        context['categories_with_children'] = categories_with_children
-        return context
-
-class FlexPage(Page):
+        children_by_parent_path = {}
+        for page in pages:
+            if page.depth == self.depth + 1:
+                child_pages = children_by_parent_path.setdefault(page.path, [])
+                categories_with_children.append({
+                    'category_page': page,
+                    'child_pages': child_pages,
+                })
+            else:
+                # ordered by path, so the category comes before its children
+                children_by_parent_path.setdefault(page.path[:-self.steplen], []).append(page)
+        return categories_with_children
+
+class FlexPage(page_urls.SitemapUrlsMixin, Page):
     """
     A generic flexible page that can contain various content blocks.
     """
@@ -17,10 +17,11 @@ from news.models import NewsItem
 
 from modelcluster.fields import ParentalKey
 from blocks import blocks as custom_blocks
+from site_settings import page_urls
 
 
 
-class HomePage(Page):
+class HomePage(page_urls.SitemapUrlsMixin, Page):
     # default template when not specified
     # template = "home/home_page.html"
 
@@ -73,7 +74,7 @@ class HomePage(Page):
         """
         context = super().get_context(request)
         current_locale = Locale.get_active()
-        context['news_articles'] = NewsItem.objects.live().public().filter(locale=current_locale).order_by("-first_published_at")[:6]
+        context['news_articles'] = NewsItem.listing_queryset().filter(locale=current_locale).order_by("-first_published_at")[:6]
         return context
 
 
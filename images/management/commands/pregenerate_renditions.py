@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtail.images import get_image_model
+
+from images.pregenerate import get_filter_specs, pregenerate_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the missing renditions of every image for the filter specs used by "
+        "the site's {% image %} tags and API serializers. Existing renditions are "
+        "skipped, so an interrupted run can be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of resizing processes (default: one per CPU, 0 to resize in this process)",
+        )
+        parser.add_argument(
+            "--upload-concurrency",
+            type=int,
+            default=4,
+            help="Number of renditions uploaded at the same time",
+        )
+        parser.add_argument(
+            "--spec",
+            action="append",
+            dest="specs",
+            help="Only generate this filter spec (can be repeated)",
+        )
+        parser.add_argument(
+            "--image",
+            action="append",
+            type=int,
+            dest="image_ids",
+            help="Only generate renditions of the image with this id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        if options["upload_concurrency"] < 1:
+            raise CommandError("--upload-concurrency must be at least 1.")
+
+        filter_specs = options["specs"] or get_filter_specs()
+        images = get_image_model().objects.all()
+        if options["image_ids"]:
+            images = images.filter(id__in=options["image_ids"])
+
+        self.stdout.write(f"Filter specs: {', '.join(filter_specs)}")
+
+        start = time.perf_counter()
+
+        def on_progress(done, total, image_id, rendition_count, error):
+            if error is not None:
+                self.stderr.write(f"[{done}/{total}] image {image_id}: {error!r}")
+            else:
+                self.stdout.write(f"[{done}/{total}] image {image_id}: {rendition_count} renditions")
+
+        stats = pregenerate_renditions(
+            images,
+            filter_specs,
+            workers=options["workers"],
+            upload_concurrency=options["upload_concurrency"],
+            on_progress=on_progress,
+        )
+
+        elapsed = time.perf_counter() - start
+        if not stats["images"]:
+            self.stdout.write("All renditions already exist.")
+            return
+
+        self.stdout.write(
+            f"Generated {stats['renditions']} renditions for {stats['images']} images "
+            f"in {elapsed:.1f}s ({stats['render_time']:.1f}s resizing, "
+            f"{stats['upload_time']:.1f}s uploading across workers), {stats['errors']} errors"
+        )
+        if stats["errors"]:
+            raise CommandError("Some renditions failed, run the command again to retry them.")
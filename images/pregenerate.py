@@ -0,0 +1,272 @@
+"""
+Ahead-of-time rendition generation.
+
+Renditions are normally generated inside the first request that renders an
+``{% image %}`` tag, which then blocks on resizing (and on the upload when media
+lives on S3). The helpers here find the filter specs the site uses, work out
+which ``CustomRendition`` rows are missing and generate them up front, resizing
+in a process pool and storing the files through a bounded pool of upload
+threads.
+
+Every rendition is stored on its own with get_or_create() on the rendition
+model's unique_together, so an interrupted run can simply be started again:
+renditions that made it to the database are skipped.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.template import engines
+from django.template.base import smart_split
+
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TAG_RE = re.compile(r"{%\s*image\s+(.+?)\s*%}")
+
+# filter specs used from Python code (serializers, blocks) rather than templates
+registered_filter_specs = set()
+
+
+def register_filter_specs(*filter_specs):
+    """
+    Declare specs that code outside the templates asks for, so they get pre-generated too.
+    """
+    registered_filter_specs.update(filter_specs)
+
+
+def find_template_filter_specs():
+    """
+    Return the filter specs of every ``{% image %}`` tag in the project's templates.
+
+    Only template directories inside the project are scanned, Wagtail's own admin
+    templates are left out.
+    """
+    base_dir = Path(settings.BASE_DIR).resolve()
+    specs = set()
+    for engine in engines.all():
+        for template_dir in getattr(engine, "template_dirs", []):
+            template_dir = Path(template_dir).resolve()
+            if not template_dir.is_relative_to(base_dir):
+                continue
+            for path in template_dir.rglob("*.html"):
+                for match in IMAGE_TAG_RE.finditer(path.read_text(encoding="utf-8")):
+                    spec = _parse_image_tag(match.group(1))
+                    if spec:
+                        specs.add(spec)
+    return specs
+
+
+def _parse_image_tag(contents):
+    # {% image <expr> <spec> [<spec> ...] [attr="value" ...] [as <name>] %}
+    bits = list(smart_split(contents))[1:]
+    filter_bits = []
+    for bit in bits:
+        if bit == "as" or "=" in bit:
+            break
+        filter_bits.append(bit)
+    return "|".join(filter_bits)
+
+
+def get_filter_specs():
+    """
+    All the filter specs the site renders images with, sorted.
+    """
+    return sorted(find_template_filter_specs() | registered_filter_specs)
+
+
+def find_missing_renditions(images, filter_specs):
+    """
+    Return ``{image_id: [filter_spec, ...]}`` for the renditions of `images` that
+    don't have a row yet. Matches on (image, filter_spec, focal_point_key), the
+    same lookup Image.find_existing_renditions() does.
+    """
+    Rendition = get_image_model().get_rendition_model()
+    images = list(images)
+    filters = [Filter(spec=spec) for spec in filter_specs]
+
+    existing = set(
+        Rendition.objects.filter(
+            image__in=images, filter_spec__in=[f.spec for f in filters]
+        ).values_list("image_id", "filter_spec", "focal_point_key")
+    )
+
+    missing = {}
+    for image in images:
+        for filter in dict.fromkeys(image.clean_filter_for_svg(f) for f in filters):
+            if (image.id, filter.spec, filter.get_cache_key(image)) not in existing:
+                missing.setdefault(image.id, []).append(filter.spec)
+    return missing
+
+
+def render_renditions(image_id, filter_specs):
+    """
+    Resize one image for every spec and return ``(image_id, renditions)``, where
+    renditions is a list of (filter_spec, focal_point_key, filename, bytes).
+
+    Runs in a worker process, so it takes and returns plain values; nothing is
+    saved here.
+    """
+    image = get_image_model().objects.get(id=image_id)
+    with image.open_file() as f:
+        original = f.read()
+
+    renditions = []
+    for spec in filter_specs:
+        filter = Filter(spec=spec)
+        rendered = image.generate_rendition_file(
+            filter, source=File(BytesIO(original), name=image.file.name)
+        )
+        rendered.seek(0)
+        renditions.append((spec, filter.get_cache_key(image), rendered.name, rendered.read()))
+    return image_id, renditions
+
+
+def store_rendition(image_id, filter_spec, focal_point_key, filename, content):
+    """
+    Upload one generated rendition and create its row, unless another process got there first.
+    """
+    Rendition = get_image_model().get_rendition_model()
+    try:
+        Rendition.objects.get_or_create(
+            image_id=image_id,
+            filter_spec=filter_spec,
+            focal_point_key=focal_point_key,
+            defaults={"file": ContentFile(content, name=filename)},
+        )
+    finally:
+        # upload threads each open their own connection
+        connections.close_all()
+
+
+def pregenerate_renditions(images, filter_specs=None, workers=None, upload_concurrency=4, on_progress=None):
+    """
+    Generate the missing renditions of `images` for `filter_specs` (by default
+    every spec the site uses).
+
+    Images are resized in a pool of `workers` processes (one per CPU by default),
+    or in this process when `workers` is 0. Finished renditions are uploaded and saved by
+    `upload_concurrency` threads; at most twice that many wait in memory, the
+    workers are paused while the uploads catch up.
+
+    `on_progress(done, total, image_id, rendition_count, error)` is called as each
+    image finishes. Returns a dict of counts and timings.
+    """
+    if filter_specs is None:
+        filter_specs = get_filter_specs()
+    missing = find_missing_renditions(images, filter_specs)
+
+    stats = {
+        "images": len(missing),
+        "renditions": 0,
+        "errors": 0,
+        "render_time": 0.0,
+        "upload_time": 0.0,
+    }
+    if not missing:
+        return stats
+
+    upload_slots = threading.BoundedSemaphore(upload_concurrency * 2)
+    stats_lock = threading.Lock()
+
+    def upload(rendition):
+        image_id, filter_spec = rendition[:2]
+        start = time.perf_counter()
+        try:
+            store_rendition(*rendition)
+        except Exception:
+            # nothing waits on the upload futures, so report it here
+            logger.exception("Storing the %s rendition of image %s failed", filter_spec, image_id)
+            with stats_lock:
+                stats["errors"] += 1
+        finally:
+            with stats_lock:
+                stats["upload_time"] += time.perf_counter() - start
+            upload_slots.release()
+
+    def finish(done, image_id, result, render_time, error):
+        with stats_lock:
+            stats["render_time"] += render_time
+        renditions = []
+        if error is None:
+            _, renditions = result
+            for spec, focal_point_key, filename, content in renditions:
+                upload_slots.acquire()
+                uploads.append(upload_pool.submit(upload, (image_id, spec, focal_point_key, filename, content)))
+            with stats_lock:
+                stats["renditions"] += len(renditions)
+        else:
+            with stats_lock:
+                stats["errors"] += 1
+        if on_progress is not None:
+            on_progress(done, len(missing), image_id, len(renditions), error)
+
+    uploads = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=upload_concurrency) as upload_pool:
+        if workers == 0:
+            for done, (image_id, specs) in enumerate(missing.items(), start=1):
+                start = time.perf_counter()
+                try:
+                    result, error = render_renditions(image_id, specs), None
+                except Exception as e:
+                    result, error = None, e
+                finish(done, image_id, result, time.perf_counter() - start, error)
+        else:
+            workers = workers or os.cpu_count()
+            # spawned rather than forked, so workers don't inherit this process's
+            # database connections and upload threads
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            ) as process_pool:
+                _render_in_pool(process_pool, missing, workers, finish)
+
+        concurrent.futures.wait(uploads)
+
+    return stats
+
+
+def _render_in_pool(process_pool, missing, workers, finish):
+    # keep only a couple of images per worker in flight, so results don't pile
+    # up in memory while the uploads are throttled
+    pending = {}
+    queue = iter(missing.items())
+    done = 0
+    while True:
+        while len(pending) < workers * 2:
+            try:
+                image_id, specs = next(queue)
+            except StopIteration:
+                break
+            future = process_pool.submit(render_renditions, image_id, specs)
+            pending[future] = (image_id, time.perf_counter())
+        if not pending:
+            return
+
+        completed, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in completed:
+            image_id, start = pending.pop(future)
+            done += 1
+            error = future.exception()
+            finish(
+                done,
+                image_id,
+                None if error else future.result(),
+                time.perf_counter() - start,
+                error,
+            )
@@ -0,0 +1,96 @@
+"""
+Batched, request-scoped rendition lookups.
+
+Calling ``image.get_rendition(spec)`` in a loop costs a cache/database lookup
+(and possibly a resize) per image and per spec. A RenditionManifest resolves all
+the specs for a whole list of images at once and memoizes the result for the
+rest of the request.
+"""
+from django.db.models import Prefetch, prefetch_related_objects
+
+from wagtail.images import get_image_model
+
+
+class RenditionManifest:
+    """
+    Memoized renditions for one request, keyed by (image id, filter spec).
+    """
+    def __init__(self):
+        self._renditions = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Return the manifest attached to `request`, creating it on first use.
+        Without a request a fresh (unshared) manifest is returned.
+        """
+        if request is None:
+            return cls()
+        try:
+            return request._rendition_manifest
+        except AttributeError:
+            request._rendition_manifest = cls()
+            return request._rendition_manifest
+
+    def get_renditions(self, image, *filter_specs):
+        """
+        Return a dict of renditions for `image` keyed by filter spec, only
+        looking up (or creating) the ones this request hasn't seen yet.
+        """
+        missing = [spec for spec in filter_specs if (image.id, spec) not in self._renditions]
+        if missing:
+            for spec, rendition in image.get_renditions(*missing).items():
+                self._renditions[(image.id, spec)] = rendition
+
+        return {spec: self._renditions[(image.id, spec)] for spec in filter_specs}
+
+    def prefetch(self, objects, filter_specs, field_name="image"):
+        """
+        Resolve `filter_specs` for the image in `field_name` of every object.
+
+        Existing renditions for all the images are fetched in a single query
+        (matched on image, filter_spec and focal_point_key, the rendition
+        model's unique_together) and only missing ones are generated. Images
+        the objects already hold (select_related) are reused, others are loaded
+        in one more query. The images are assigned back to the objects so
+        templates and serializers don't query them one by one, and
+        ``{% image %}`` finds the renditions on them.
+        """
+        filter_specs = list(filter_specs)
+        images = {}
+        missing_ids = set()
+        for obj in objects:
+            image_id = getattr(obj, f"{field_name}_id", None)
+            if image_id is None:
+                continue
+            if obj._meta.get_field(field_name).is_cached(obj):
+                images.setdefault(image_id, getattr(obj, field_name))
+            else:
+                missing_ids.add(image_id)
+        if not images and not missing_ids:
+            return
+
+        image_model = get_image_model()
+        if images:
+            prefetch_related_objects(
+                list(images.values()),
+                Prefetch(
+                    "renditions",
+                    queryset=image_model.get_rendition_model().objects.filter(filter_spec__in=filter_specs),
+                    to_attr="prefetched_renditions",
+                ),
+            )
+        missing_ids.difference_update(images)
+        if missing_ids:
+            images.update(
+                (image.id, image)
+                for image in image_model.objects.filter(id__in=missing_ids).prefetch_renditions(*filter_specs)
+            )
+
+        for image in images.values():
+            self.get_renditions(image, *filter_specs)
+
+        for obj in objects:
+            image = images.get(getattr(obj, f"{field_name}_id", None))
+            if image is not None:
+                setattr(obj, field_name, image)
@@ -0,0 +1,13 @@
+from django_tasks import task
+
+from wagtail.images import get_image_model
+
+from images.pregenerate import pregenerate_renditions
+
+
+@task()
+def pregenerate_renditions_task(image_ids):
+    """
+    Generate the missing renditions of the given images, in this process.
+    """
+    pregenerate_renditions(get_image_model().objects.filter(id__in=image_ids), workers=0)
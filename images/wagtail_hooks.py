@@ -0,0 +1,36 @@
+from django.db import transaction
+
+from wagtail import hooks
+from wagtail.images import get_image_model
+
+from images.tasks import pregenerate_renditions_task
+
+
+def get_referenced_image_ids(page):
+    """
+    Ids of the images a page uses, from image foreign keys as well as from
+    StreamField blocks and rich text.
+    """
+    Image = get_image_model()
+    image_ids = set()
+    for field in page._meta.get_fields():
+        if field.many_to_one and field.related_model is Image:
+            image_id = field.value_from_object(page)
+            if image_id is not None:
+                image_ids.add(image_id)
+        elif hasattr(field, "extract_references"):
+            value = field.value_from_object(page)
+            if value is None:
+                continue
+            for model, object_id, _, _ in field.extract_references(value):
+                if model is Image:
+                    image_ids.add(int(object_id))
+    return sorted(image_ids)
+
+
+@hooks.register("after_publish_page")
+def pregenerate_page_renditions(request, page):
+    # render the renditions now, rather than in the first visitor's request
+    image_ids = get_referenced_image_ids(page.specific)
+    if image_ids:
+        transaction.on_commit(lambda: pregenerate_renditions_task.enqueue(image_ids))
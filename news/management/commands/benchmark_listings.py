@@ -0,0 +1,182 @@
+import datetime
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone, translation
+
+from wagtail.models import Site
+
+from news.models import NewsIndex, NewsItem
+from programs.models import Program, ProgramIndex
+from site_settings.listings import set_listing_urls
+
+
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark-listings",
+    },
+}
+
+PARAGRAPH = (
+    "<p>Our region runs recreational and competitive programs for players of all "
+    "ages, with volunteer coaches and referees on every field. "
+    '<a href="https://example.com/">Read more about it</a>.</p>'
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def result_bytes(captured):
+    """
+    Run the captured queries again and add up the size of the values they return,
+    roughly what the database sends over the wire.
+    """
+    total = 0
+    with connection.cursor() as cursor:
+        for query in captured:
+            cursor.execute(query["sql"])
+            for row in cursor.fetchall():
+                total += sum(len(str(value).encode("utf-8")) for value in row if value is not None)
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Create throwaway news items and programs with full bodies and compare the "
+        "listing querysets (news index page, recent news block, program index) "
+        "with full rows and per-item page.url against the .only() projections and "
+        "set_listing_urls(). Nothing is kept: the pages are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--news-items",
+            type=int,
+            default=50,
+            help="Number of news items to create",
+        )
+        parser.add_argument(
+            "--programs",
+            type=int,
+            default=12,
+            help="Number of programs to create",
+        )
+        parser.add_argument(
+            "--paragraphs",
+            type=int,
+            default=30,
+            help="Rich text paragraphs in each news body and program field",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of times each listing is loaded",
+        )
+
+    def handle(self, *args, **options):
+        site = Site.objects.filter(is_default_site=True).select_related("root_page").first()
+        if site is None:
+            raise CommandError("No default site found.")
+
+        # the site root paths are cached, like in production
+        with override_settings(CACHES=BENCHMARK_CACHES), translation.override(
+            site.root_page.locale.language_code
+        ):
+            try:
+                with transaction.atomic():
+                    self.build_pages(site.root_page, options)
+                    self.stdout.write(f"Database: {connection.vendor}")
+                    self.run_benchmark(site, options["repeat"])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def build_pages(self, site_root, options):
+        text = PARAGRAPH * options["paragraphs"]
+        stamp = time.time_ns()
+
+        news_index = NewsIndex.objects.descendant_of(site_root).first()
+        if news_index is None:
+            news_index = site_root.add_child(instance=NewsIndex(title="News", slug=f"news-{stamp}"))
+        for i in range(options["news_items"]):
+            news_index.add_child(instance=NewsItem(
+                title=f"Benchmark article {i}",
+                slug=f"benchmark-article-{stamp}-{i}",
+                # newer than the existing articles, so the listings show these
+                first_published_at=timezone.now() + datetime.timedelta(minutes=i),
+                intro=PARAGRAPH,
+                body=[("text", text) for _ in range(4)],
+            ))
+
+        program_index = ProgramIndex.objects.descendant_of(site_root).first()
+        if program_index is None:
+            program_index = site_root.add_child(instance=ProgramIndex(title="Programs", slug=f"programs-{stamp}"))
+        for i in range(options["programs"]):
+            program_index.add_child(instance=Program(
+                title=f"Benchmark program {i}",
+                slug=f"benchmark-program-{stamp}-{i}",
+                ages="U10-U14",
+                description=text,
+                tryouts=text,
+                equipment=text,
+                schedule=text,
+                registration=text,
+            ))
+        self.locale = news_index.locale
+
+    def run_benchmark(self, site, repeat):
+        factory = RequestFactory()
+
+        def new_request():
+            request = factory.get("/", HTTP_HOST=site.hostname)
+            request._wagtail_site = site
+            return request
+
+        news = NewsItem.objects.live().public().filter(locale=self.locale).order_by("-first_published_at")
+        listing_news = NewsItem.listing_queryset().filter(locale=self.locale).order_by("-first_published_at")
+        programs = Program.objects.live().public().filter(locale=self.locale)
+        listing_programs = Program.listing_queryset().filter(locale=self.locale)
+
+        def cards(items, image_field):
+            # what a card template reads
+            return [(item.url, item.title, getattr(item, image_field)) for item in items]
+
+        def listing_cards(items, image_field):
+            set_listing_urls(items, new_request())
+            return [(item.listing_url, item.title, getattr(item, image_field)) for item in items]
+
+        listings = [
+            ("news index page (7 items)", lambda: cards(list(news.select_related("image")[:7]), "image"),
+             lambda: listing_cards(list(listing_news[:7]), "image")),
+            ("recent news block (3 items)", lambda: cards(list(news[:3]), "image"),
+             lambda: listing_cards(list(listing_news[:3]), "image")),
+            ("program index", lambda: cards(list(programs.all()), "logo"),
+             lambda: listing_cards(list(listing_programs.all()), "logo")),
+        ]
+
+        for label, before, after in listings:
+            for variant, load in [("full rows, page.url", before), ("projection, listing_url", after)]:
+                cache.clear()
+                load()  # warm the site root paths
+                with CaptureQueriesContext(connection) as captured:
+                    load()
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    load()
+                    timings.append(time.perf_counter() - start)
+                self.stdout.write(
+                    f"{label}, {variant}: {len(captured)} queries, "
+                    f"{result_bytes(captured) / 1024:.1f} KiB, "
+                    f"{statistics.median(timings) * 1000:.2f} ms"
+                )
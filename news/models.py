@@ -1,8 +1,15 @@
+import calendar
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
 from django.db import models
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from modelcluster.fields import ParentalKey
 from modelcluster.contrib.taggit import ClusterTaggableManager
@@ -18,19 +25,23 @@ from wagtail.admin.panels import PublishingPanel
 from wagtail.models import DraftStateMixin, RevisionMixin, LockableMixin, PreviewableMixin
 from wagtail.search import index
 from wagtail.contrib.routable_page.models import RoutablePageMixin, path, re_path
-from wagtail.contrib.table_block.blocks import TableBlock
 from wagtail.api import APIField
 from wagtail.images import get_image_model
-from wagtail.templatetags.wagtailcore_tags import richtext
 from wagtail.models import TranslatableMixin, BootstrapTranslatableMixin, Locale
 from wagtail.users.utils import get_gravatar_url
 from rest_framework.fields import Field
 
 from blocks import blocks as custom_blocks
+from images.pregenerate import register_filter_specs
+from images.renditions import RenditionManifest
+from news.pagination import KeysetPaginator
+from site_settings import cache as fragment_cache
+from site_settings import page_urls, richtext
+from site_settings.listings import set_listing_urls
 
 
 # Create your models here.
-class NewsIndex(RoutablePageMixin, Page):
+class NewsIndex(RoutablePageMixin, page_urls.SitemapUrlsMixin, Page):
     """
     A page that lists all news articles.
     """
@@ -42,6 +53,13 @@ class NewsIndex(RoutablePageMixin, Page):
     subtitle = models.CharField(max_length=100, blank=True)
     body = RichTextField(blank=True)
 
+    # image renditions of the news cards, prefetched per page of items: the first
+    # cards of the index's first page are featured (see news_index.html), the
+    # others, the archive and the tag pages show thumbnails
+    FEATURED_COUNT = 6
+    FEATURED_RENDITION_SPECS = ["fill-700x500"]
+    LISTING_RENDITION_SPECS = ["fill-200x200"]
+
     content_panels = Page.content_panels + [
         FieldPanel('subtitle'),
         FieldPanel('body'),
@@ -61,15 +79,16 @@ class NewsIndex(RoutablePageMixin, Page):
         """
         # get the existing sitemap
         sitemap = super().get_sitemap_urls(request)
+        url = page_urls.get_full_url(self, request)
         last_mod = NewsItem.objects.live().public().order_by('-last_published_at').first()
         sitemap.append({
             # even if the path changes it will be auto-updated because we're using the
             # named attribute 'all' to point to that url
-            'location': self.get_full_url(request) + self.reverse_subpage('all'),
+            'location': url + self.reverse_subpage('all'),
             'lastmod': last_mod.last_published_at or last_mod.latest_revision_created_at,
         })
         sitemap.append({
-            'location': self.get_full_url(request) + self.reverse_subpage('tag', args=['refs']),
+            'location': url + self.reverse_subpage('tag', args=['refs']),
         })
 
         return sitemap
@@ -83,12 +102,14 @@ class NewsIndex(RoutablePageMixin, Page):
         """
         # context = super().get_context(request)
         current_locale = Locale.get_active()
-        tagged_news = NewsItem.objects.live().public().filter(locale=current_locale, tags__name=tag).order_by('-first_published_at')
+        tagged_news = NewsItem.listing_queryset().filter(locale=current_locale, tags__name=tag)
 
         paginated_items, paginator = self._get_pagination_context(
             request,
             tagged_news,
-            limit=2
+            limit=2,
+            count_key=(self.id, current_locale.id, tag),
+            rendition_specs=self.LISTING_RENDITION_SPECS,
         )
 
         return self.render(
@@ -109,57 +130,114 @@ class NewsIndex(RoutablePageMixin, Page):
 
         This is not a good practice for building APIs in Wagtail/Django,
         but is included here for demonstration purposes.
+
+        The response is streamed and carries an ETag and Last-Modified based on the
+        newest article of the year, so polling clients get a 304 until something
+        in that year is published or unpublished.
         """
         articles = NewsItem.objects.live().public().filter(
             first_published_at__year=year
         )
-        return JsonResponse(
-            {
-                "status": "ok",
-                "articles": [
-                    {
-                        "title": article.title,
-                        "url": article.url,  # reminder: url is a method not a property
-                        "first_published_at": article.first_published_at.isoformat(),
-                    }
-                    for article in articles
-                ],
-            }
+
+        latest = articles.aggregate(
+            last_published_at=models.Max("last_published_at"),
+            count=models.Count("id"),
         )
+        etag = last_modified = None
+        if latest["last_published_at"] is not None:
+            # whole seconds, like the parsed If-Modified-Since it's compared with
+            last_modified = calendar.timegm(latest["last_published_at"].utctimetuple())
+            etag = quote_etag(
+                hashlib.md5(
+                    f"{year}:{latest['last_published_at'].isoformat()}:{latest['count']}".encode()
+                ).hexdigest()
+            )
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        response = StreamingHttpResponse(
+            self._stream_api_articles(request, articles),
+            content_type="application/json",
+        )
+        if etag is not None:
+            response.headers["ETag"] = etag
+            response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def _stream_api_articles(self, request, articles):
+        """
+        Yield the JSON body of api_news_items piece by piece.
+
+        Only the needed columns are read, in chunks. URLs come from the page URL
+        map (see site_settings.page_urls) instead of calling article.url for
+        every article.
+        """
+        yield '{"status": "ok", "articles": ['
+        for i, article in enumerate(
+            articles.values("id", "title", "first_published_at").iterator(chunk_size=500)
+        ):
+            if i:
+                yield ", "
+            yield json.dumps({
+                "title": article["title"],
+                "url": page_urls.get_url(article["id"], request),
+                "first_published_at": article["first_published_at"].isoformat(),
+            })
+        yield "]}"
 
     def get_context(self, request):
         """
         Add the list of news articles to the context with pagination.
         """
         current_locale = Locale.get_active()
-        all_news = NewsItem.objects.live().public().filter(locale=current_locale).order_by('-first_published_at')
+        all_news = NewsItem.listing_queryset().filter(locale=current_locale)
 
         paginated_items, paginator = self._get_pagination_context(
             request,
             all_news,
-            limit=7
+            limit=7,
+            count_key=(self.id, current_locale.id),
+            rendition_specs=self.LISTING_RENDITION_SPECS,
+            featured_rendition_specs=self.FEATURED_RENDITION_SPECS,
         )
 
         context = super().get_context(request)
-        context['news_items'] = paginated_items
+        context['news_items'] = richtext.set_rendered(paginated_items, 'intro')
         context['paginator'] = paginator
 
         return context
 
-    def _get_pagination_context(self, request, news_items, limit=20):
+    def _get_pagination_context(
+        self, request, news_items, limit=20, count_key=None, rendition_specs=(), featured_rendition_specs=()
+    ):
         """
         A helper method to get pagination context.
+
+        Pages are fetched by cursor, newest first (see news/pagination.py). With a
+        `count_key` the total number of items is cached until a news item is
+        published, unpublished or deleted.
+
+        The renditions in `rendition_specs` are prefetched for the images of the
+        items, except for the first FEATURED_COUNT items of the first page when
+        `featured_rendition_specs` are given: they only get those.
         """
-        # Paginate with 20 items per page
-        paginator = Paginator(news_items, limit)
-        page_number = request.GET.get('page', 1)
+        paginator = KeysetPaginator(
+            news_items,
+            limit,
+            count_key=count_key,
+            count_dependencies=[NewsItem, fragment_cache.PAGE_URLS],
+        )
+        news_page = paginator.get_page(request.GET)
+        set_listing_urls(news_page.object_list, request)
 
-        try:
-            news_page = paginator.page(page_number)
-        except PageNotAnInteger:
-            news_page = paginator.page(1)
-        except EmptyPage:
-            news_page = paginator.page(paginator.num_pages)
+        items = list(news_page.object_list)
+        featured = items[:self.FEATURED_COUNT] if featured_rendition_specs and news_page.number == 1 else []
+        manifest = RenditionManifest.for_request(request)
+        if featured:
+            manifest.prefetch(featured, featured_rendition_specs)
+        if rendition_specs:
+            manifest.prefetch(items[len(featured):], rendition_specs)
 
         return news_page, paginator
 
@@ -180,8 +258,20 @@ class NewsItemTags(TaggedItemBase):
 # -------
 
 class ImageSerializer(Field):
+    # API size name -> rendition filter spec
+    RENDITION_SPECS = {
+        "thumbnail": "max-165x165",
+        "small": "max-300x300",
+        "medium": "max-700x700",
+    }
+
     def to_representation(self, value):
-        return {
+        # renditions are resolved once per request (and batched for listings, see website/api.py)
+        renditions = RenditionManifest.for_request(self.context.get("request")).get_renditions(
+            value, *self.RENDITION_SPECS.values()
+        )
+
+        representation = {
             "original": {
                 "id": value.id,
                 "title": value.title,
@@ -189,25 +279,19 @@ class ImageSerializer(Field):
                 "width": value.width,
                 "height": value.height,
             },
-            "thumbnail": {
-                "id": value.get_rendition('max-165x165').id,
-                "url": value.get_rendition('max-165x165').url,
-                "width": value.get_rendition('max-165x165').width,
-                "height": value.get_rendition('max-165x165').height,
-            },
-            "small": {
-                "id": value.get_rendition('max-300x300').id,
-                "url": value.get_rendition('max-300x300').url,
-                "width": value.get_rendition('max-300x300').width,
-                "height": value.get_rendition('max-300x300').height,
-            },
-            "medium": {
-                "id": value.get_rendition('max-700x700').id,
-                "url": value.get_rendition('max-700x700').url,
-                "width": value.get_rendition('max-700x700').width,
-                "height": value.get_rendition('max-700x700').height,
-            },
         }
+        for size, filter_spec in self.RENDITION_SPECS.items():
+            rendition = renditions[filter_spec]
+            representation[size] = {
+                "id": rendition.id,
+                "url": rendition.url,
+                "width": rendition.width,
+                "height": rendition.height,
+            }
+        return representation
+
+
+register_filter_specs(*ImageSerializer.RENDITION_SPECS.values())
 
 
 class RichTextSerializer(Field):
@@ -215,16 +299,26 @@ class RichTextSerializer(Field):
     Serializer for RichTextField to convert to HTML for API output.
     """
     def to_representation(self, value):
-        return richtext(value)
+        return richtext.render(value)
 
 
-class NewsItem(Page):
+class NewsItem(page_urls.SitemapUrlsMixin, Page):
     """
     A page that displays a specific new article.
     """
     parent_page_types = ['news.NewsIndex']   # restrict parent page to NewsIndex
     subpage_types = []  # restrict child pages to none
 
+    # number of other articles in the "Other Recent News" carousel, and its image rendition
+    RELATED_NEWS_COUNT = 5
+    RELATED_NEWS_RENDITION_SPECS = ["fill-600x192"]
+
+    # the columns news cards use, see listing_queryset()
+    LISTING_FIELDS = [
+        "title", "path", "depth", "url_path", "locale", "first_published_at",
+        "subtitle", "intro", "image",
+    ]
+
     # can always override the default template from base.py
     # https://docs.wagtail.org/en/stable/advanced_topics/privacy.html
     # password_required_template = "news/news_item_password_required.html"
@@ -244,7 +338,7 @@ class NewsItem(Page):
     body = StreamField(
         [
             ("text", custom_blocks.RichTextBlock()),
-            ("table", TableBlock()),
+            ("table", custom_blocks.TableBlock()),
             ("image", custom_blocks.ImageBlock()),
             ("doc", DocumentChooserBlock(
                 # can set your own template here if you want
@@ -284,6 +378,14 @@ class NewsItem(Page):
         APIField("custom_content"),
     ]
 
+    @classmethod
+    def listing_queryset(cls):
+        """
+        Live, public news items with only the columns news cards use (no body)
+        and their image.
+        """
+        return cls.objects.live().public().only(*cls.LISTING_FIELDS).select_related('image')
+
     def custom_content(self):
         """
         Custom content that can be serialized in the API.
@@ -310,43 +412,91 @@ class NewsItem(Page):
 
     def get_context(self, request):
         """
-        Add recent news block data to the context.
+        Add the section title, the owner's avatar and the related news to the context.
         """
         context = super().get_context(request)
 
-        # Add the parent page title as section_title
-        parent_page = self.get_parent()
-        if parent_page:
-            context['section_title'] = parent_page.title
+        # the parent is always the news index, see parent_page_types
+        context['section_title'], context['section_url'] = self.get_section(request)
 
         # drafts don't have an owner so there's no avatar yet
-        if self.owner:
-            if not self.owner.wagtail_userprofile.avatar:
-                context['owner_avatar_url'] = get_gravatar_url(self.owner.email)
+        context['owner_avatar_url'] = None
+        if self.owner_id:
+            # fetch the owner and their profile in one query
+            self.owner = get_user_model().objects.select_related('wagtail_userprofile').get(pk=self.owner_id)
+            profile = getattr(self.owner, 'wagtail_userprofile', None)
+            if profile is not None and profile.avatar:
+                context['owner_avatar_url'] = profile.avatar.url
             else:
-                context['owner_avatar_url'] = self.owner.wagtail_userprofile.avatar.url
-        else:
-            context['owner_avatar_url'] = None
+                context['owner_avatar_url'] = get_gravatar_url(self.owner.email)
 
-        # Create a RecentNewsBlock instance with desired config
-        from blocks.blocks import RecentNewsBlock
+        context['recent_news_html'] = self.get_related_news_html(request, context)
+        return context
 
-        recent_news_block = RecentNewsBlock()
+    def get_section(self, request):
+        """
+        Return the title and URL of the parent news index, cached until a news
+        index is published or a page moves.
+        """
+        parent_path = self.path[:-self.steplen]
+
+        def get_parent_title_and_url():
+            parent = Page.objects.get(path=parent_path)
+            return parent.title, parent.get_url(request)
+
+        if getattr(request, 'is_preview', False):
+            return get_parent_title_and_url()
+        return fragment_cache.get_or_set(
+            fragment_cache.make_key("news-section", request.get_host(), parent_path),
+            [NewsIndex, fragment_cache.PAGE_URLS],
+            get_parent_title_and_url,
+        )
 
-        # Prepare block value (field data)
-        block_value = {
-            'title': 'Other Recent News',
-            'subtitle': '',
-            'num_items': 5,
-            'filter_by_tag': '',
-        }
+    def get_related_news_html(self, request, context):
+        """
+        Render the "Other Recent News" carousel.
 
-        # Render the block with current page ID for exclusion
-        context['current_page_id'] = self.id
-        rendered_block = recent_news_block.render(
-            recent_news_block.to_python(block_value),
-            context=context
+        The newest news items of the locale are the same for every article, so
+        the carousel is only rendered once per locale and shared by all articles
+        that aren't among them; only those few get a variant of their own. Both
+        are evicted when a news item of this locale is published, unpublished,
+        deleted or moved.
+        """
+        dependencies = [
+            fragment_cache.locale_dependency_key(NewsItem, self.locale_id),
+            fragment_cache.PAGE_URLS,
+        ]
+        news_items = NewsItem.listing_queryset().filter(locale_id=self.locale_id).order_by('-first_published_at')
+
+        def render_related_news(excluded_id):
+            related_news = set_listing_urls(
+                list(news_items.exclude(id=excluded_id)[:self.RELATED_NEWS_COUNT]), request
+            )
+            RenditionManifest.for_request(request).prefetch(related_news, self.RELATED_NEWS_RENDITION_SPECS)
+            richtext.set_rendered(related_news, 'intro')
+            return render_to_string(
+                "blocks/recent_news_carousel.html",
+                {
+                    'self': {'title': 'Other Recent News', 'subtitle': ''},
+                    'block': {'id': 'related-news'},
+                    'news_items': related_news,
+                    'page': self,
+                },
+                request=request,
+            )
+
+        if getattr(request, 'is_preview', False):
+            return render_related_news(self.id)
+
+        # the newest items, plus one to fill in when the current page is one of them
+        newest_ids = fragment_cache.get_or_set(
+            fragment_cache.make_key("news-newest-ids", self.locale_id),
+            dependencies,
+            lambda: list(news_items.values_list('id', flat=True)[:self.RELATED_NEWS_COUNT + 1]),
+        )
+        excluded_id = self.id if self.id in newest_ids else None
+        return fragment_cache.get_or_set(
+            fragment_cache.make_key("related-news", request.get_host(), self.locale_id, excluded_id),
+            dependencies,
+            lambda: render_related_news(excluded_id),
         )
-
-        context['recent_news_html'] = rendered_block
-        return context
@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination for news listings.
+
+Django's Paginator runs a COUNT(*) and an OFFSET scan on every page, which gets
+slower the deeper a visitor goes into the archive. KeysetPaginator orders by
+(first_published_at, id) and the next/previous links carry a cursor holding the
+sort key of the last/first item shown, so each page is an index range lookup no
+matter how deep it is. The links also stay on the same articles when new ones
+are published in the meantime.
+
+Plain ``?page=N`` links (the numbered page buttons, old bookmarks) still work,
+they fall back to an offset query. The total used for "Page N of M" can be
+cached in the fragment cache.
+"""
+import datetime
+from collections.abc import Sequence
+from math import ceil
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from site_settings import cache as fragment_cache
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(item):
+    """
+    "<microseconds since the epoch>-<id>" for the sort key of `item`.
+    """
+    delta = item.first_published_at - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f"{microseconds}-{item.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Return the (first_published_at, id) encoded in `cursor`, or None if it isn't valid.
+    """
+    try:
+        microseconds, item_id = cursor.rsplit("-", 1)
+        return EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(item_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class KeysetPage(Sequence):
+    """
+    One page of a KeysetPaginator. Quacks like Django's Page for the templates
+    (number, has_next, previous_page_number, ...) and adds next_url and previous_url.
+    """
+    def __init__(self, object_list, number, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f"<KeysetPage {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_url(self):
+        return "?" + urlencode({"page": self.number + 1, "after": encode_cursor(self.object_list[-1])})
+
+    @property
+    def previous_url(self):
+        if self.number <= 2:
+            return "?page=1"
+        return "?" + urlencode({"page": self.number - 1, "before": encode_cursor(self.object_list[0])})
+
+
+class KeysetPaginator:
+    """
+    Paginate a page queryset newest first, on (first_published_at, id). Pages
+    that were never published (no first_published_at, e.g. imported ones)
+    have no sort key and are left out.
+
+    `count_key` (a tuple of key parts) caches the total in the fragment cache,
+    evicted when any of `count_dependencies` changes. Without it, the total is
+    only counted when a template asks for it.
+    """
+    def __init__(self, queryset, per_page, count_key=None, count_dependencies=()):
+        self.queryset = queryset.filter(first_published_at__isnull=False).order_by("-first_published_at", "-id")
+        self.per_page = per_page
+        self.count_key = count_key
+        self.count_dependencies = count_dependencies
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.queryset.count()
+        return fragment_cache.get_or_set(
+            fragment_cache.make_key("keyset-count", *self.count_key),
+            self.count_dependencies,
+            self.queryset.count,
+        )
+
+    @property
+    def num_pages(self):
+        return max(1, ceil(self.count / self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, params):
+        """
+        Return the KeysetPage for the query parameters `params` (``request.GET``):
+        ``after``/``before`` cursors from next/previous links, otherwise ``page``.
+        """
+        try:
+            number = max(int(params.get("page", 1)), 1)
+        except (TypeError, ValueError):
+            number = 1
+
+        after = decode_cursor(params.get("after"))
+        before = decode_cursor(params.get("before"))
+
+        if after is not None:
+            published_at, item_id = after
+            items = list(
+                self.queryset.filter(
+                    Q(first_published_at__lt=published_at)
+                    | Q(first_published_at=published_at, id__lt=item_id)
+                )[:self.per_page + 1]
+            )
+            if items:
+                return KeysetPage(
+                    items[:self.per_page], max(number, 2), self,
+                    has_previous=True, has_next=len(items) > self.per_page,
+                )
+        elif before is not None:
+            published_at, item_id = before
+            items = list(
+                self.queryset.filter(
+                    Q(first_published_at__gt=published_at)
+                    | Q(first_published_at=published_at, id__gt=item_id)
+                ).order_by("first_published_at", "id")[:self.per_page + 1]
+            )
+            if items:
+                has_previous = len(items) > self.per_page
+                return KeysetPage(
+                    items[:self.per_page][::-1], number if has_previous else 1, self,
+                    has_previous=has_previous, has_next=True,
+                )
+
+        # ?page=N, or a cursor pointing past the end of the list
+        if number > 1:
+            number = min(number, self.num_pages)
+        offset = (number - 1) * self.per_page
+        items = list(self.queryset[offset:offset + self.per_page + 1])
+        return KeysetPage(
+            items[:self.per_page], number, self,
+            has_previous=number > 1, has_next=len(items) > self.per_page,
+        )
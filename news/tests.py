@@ -1,3 +1,242 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone, translation
+
+from wagtail.models import Locale, Page, Site
+
+from home.models import HomePage
+from news.models import NewsIndex, NewsItem
+from news.pagination import KeysetPaginator, decode_cursor, encode_cursor
+from site_settings import page_urls
+from site_settings.instrumentation import QueryBudgetExceeded
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "news-tests",
+        },
+    },
+    # measure rendering, not the full-page cache
+    MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != "site_settings.page_cache.PageCacheMiddleware"],
+    # fail on pages over their query budget, and don't store request samples
+    QUERY_BUDGET_RAISE=True,
+    REQUEST_METRICS_SAMPLE_RATE=0,
+    REQUEST_METRICS_SERVER_TIMING=True,
+    # the manifest only exists after collectstatic
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class NewsItemQueryCountTests(TestCase):
+    """
+    Pin the number of queries a news article costs once the caches are warm, so
+    a change that adds per-request lookups (parent page, owner profile, the
+    related news carousel, ...) shows up here.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(
+            username="editor", email="editor@example.com", first_name="Ed", last_name="Itor"
+        )
+        # the initial migration creates the locale from LANGUAGE_CODE ("en-us"),
+        # the site serves "en"
+        Locale.objects.update(language_code="en")
+        root = Page.get_first_root_node()
+        home = root.add_child(instance=HomePage(title="Home", slug="news-tests-home"))
+        Site.objects.update(root_page=home)
+        news_index = home.add_child(instance=NewsIndex(title="Latest", slug="news"))
+
+        cls.news_items = []
+        for i in range(8):
+            news_item = news_index.add_child(
+                instance=NewsItem(title=f"Article {i}", slug=f"article-{i}", intro=f"<p>Intro {i}</p>", owner=owner)
+            )
+            news_item.tags.add("general")
+            news_item.save_revision(user=owner).publish()
+            cls.news_items.append(news_item)
+
+    def setUp(self):
+        cache.clear()
+        # the page URL map outlives the rolled back changes of the previous test
+        page_urls.rebuild()
+        self.client.defaults["HTTP_HOST"] = Site.objects.get().hostname
+
+    def test_news_item_query_count(self):
+        url = "/en/news/article-0/"
+
+        # warm the fragment caches
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.assertNumQueries(14):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Other Recent News")
+        self.assertNotContains(response, f'href="{url}" class="hover:text-primary')
+
+    def test_query_budget(self):
+        url = "/en/news/article-0/"
+        response = self.client.get(url)
+        self.assertIn('desc="NewsItem"', response.headers["Server-Timing"])
+
+        with override_settings(QUERY_BUDGETS={"NewsItem": 5}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url)
+
+    def test_related_news_shared_between_articles(self):
+        # articles outside the newest few share a single cached carousel
+        self.assertEqual(self.client.get("/en/news/article-0/").status_code, 200)
+
+        # only the section nav of the new article is loaded, two queries
+        with self.assertNumQueries(16):
+            response = self.client.get("/en/news/article-1/")
+        self.assertContains(response, "Article 7")
+
+    def test_related_news_updated_on_publish(self):
+        url = "/en/news/article-0/"
+        self.client.get(url)
+
+        newest = self.news_items[-1]
+        newest.title = "Breaking"
+        # fragments are evicted once the publish is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            newest.save_revision().publish()
+
+        response = self.client.get(url)
+        self.assertContains(response, "Breaking")
+
+    def test_intro_links_follow_linked_page(self):
+        linked, newest = self.news_items[0], self.news_items[-1]
+        newest.intro = f'<p>See <a linktype="page" id="{linked.pk}">the first article</a></p>'
+        with self.captureOnCommitCallbacks(execute=True):
+            newest.save_revision().publish()
+
+        response = self.client.get("/en/news/")
+        self.assertContains(response, '<a href="/en/news/article-0/">the first article</a>', html=True)
+
+        # the cached expansion is evicted when the linked page's URL changes
+        linked.slug = "first-article"
+        with self.captureOnCommitCallbacks(execute=True):
+            linked.save_revision().publish()
+
+        response = self.client.get("/en/news/")
+        self.assertContains(response, '<a href="/en/news/first-article/">the first article</a>', html=True)
+
+    def test_page_urls_from_map(self):
+        request = RequestFactory().get("/en/news/")
+        expected = [f"/en/news/article-{i}/" for i in range(len(self.news_items))]
+        with translation.override("en"):
+            page_urls.get_urls(request)
+            with self.assertNumQueries(0):
+                urls = [page_urls.get_url(news_item, request) for news_item in self.news_items]
+            self.assertEqual(urls, expected)
+
+            # the moved or renamed page is updated in place once the change is committed
+            news_item = self.news_items[0]
+            news_item.slug = "renamed"
+            with self.captureOnCommitCallbacks(execute=True):
+                news_item.save_revision().publish()
+            self.assertEqual(page_urls.get_url(news_item.pk), "/en/news/renamed/")
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_page_urls_without_request_or_cache(self):
+        news_item = self.news_items[1]
+        with translation.override("en"):
+            page_urls.get_url(news_item)
+            # a missing version doesn't rebuild the map
+            with self.assertNumQueries(0):
+                for _ in range(3):
+                    self.assertEqual(page_urls.get_url(news_item), "/en/news/article-1/")
+
+    def test_api_not_modified(self):
+        url = f"/en/news/api/{timezone.now().year}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        b"".join(response.streaming_content)
+
+        response_304 = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers["ETag"])
+        self.assertEqual(response_304.status_code, 304)
+
+        response_304 = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response.headers["Last-Modified"])
+        self.assertEqual(response_304.status_code, 304)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "keyset-pagination-tests",
+        },
+    },
+)
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        root = Page.get_first_root_node()
+        home = root.add_child(instance=HomePage(title="Home", slug="pagination-tests-home"))
+        news_index = home.add_child(instance=NewsIndex(title="Latest", slug="news"))
+        for i in range(7):
+            news_index.add_child(instance=NewsItem(title=f"Article {i}", slug=f"article-{i}"))
+
+        # three articles share a timestamp, the last one was never published
+        published_at = timezone.now().replace(microsecond=0)
+        ids = list(NewsItem.objects.order_by("id").values_list("id", flat=True))
+        for i, item_id in enumerate(ids[:-1]):
+            NewsItem.objects.filter(id=item_id).update(
+                first_published_at=published_at - datetime.timedelta(hours=max(i - 2, 0))
+            )
+        cls.unpublished_id = ids[-1]
+        # newest first, ties on the timestamp broken by id
+        cls.expected_ids = [item_id for _, item_id in sorted(
+            NewsItem.objects.filter(first_published_at__isnull=False).values_list("first_published_at", "id"),
+            reverse=True,
+        )]
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, **kwargs):
+        return KeysetPaginator(NewsItem.objects.all(), 2, **kwargs)
+
+    def test_cursor_round_trip(self):
+        item = NewsItem.objects.get(id=self.expected_ids[0])
+        self.assertEqual(decode_cursor(encode_cursor(item)), (item.first_published_at, item.id))
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+
+    def test_cursors_walk_every_item_once(self):
+        page = self.paginator().get_page({})
+        seen = [item.id for item in page]
+        while page.has_next():
+            page = self.paginator().get_page(QueryDict(page.next_url[1:]))
+            seen.extend(item.id for item in page)
+        self.assertEqual(seen, self.expected_ids)
+        self.assertNotIn(self.unpublished_id, seen)
+
+        # and back again from the last page
+        while page.has_previous():
+            previous = self.paginator().get_page(QueryDict(page.previous_url[1:]))
+            self.assertEqual(previous.number, page.number - 1)
+            page = previous
+        self.assertEqual([item.id for item in page], self.expected_ids[:2])
+
+    def test_page_number_fallback(self):
+        page = self.paginator().get_page({"page": "2"})
+        self.assertEqual(page.number, 2)
+        self.assertEqual([item.id for item in page], self.expected_ids[2:4])
+
+        # past the end, the last page
+        page = self.paginator().get_page({"page": "99"})
+        self.assertEqual(page.number, 3)
+        self.assertEqual([item.id for item in page], self.expected_ids[4:])
+
+    def test_count_cached(self):
+        self.assertEqual(self.paginator(count_key=("tests",), count_dependencies=[NewsItem]).count, 6)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator(count_key=("tests",), count_dependencies=[NewsItem]).count, 6)
@@ -2,7 +2,6 @@
 # 2. create a snippetviewset
 # 3. add some settings for the snippetviewset
 # 4. register the class as a snippet
-from django.core.cache import cache
 from django.contrib.auth.models import Permission
 from django.utils.safestring import mark_safe
 
@@ -34,15 +33,6 @@ class TagSnippetViewSet(SnippetViewSet):
     ]
 
 
-# https://docs.wagtail.org/en/stable/reference/hooks.html#hooks
-@hooks.register("after_publish_page")
-def delete_all_cache(request, page):
-    """
-    Delete all cache when a page is saved.
-    """
-    cache.clear()
-
-
 class WelcomePanel(Component):
     order = 10
     template_name = "panels/welcome_panel.html"
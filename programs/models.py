@@ -7,9 +7,12 @@ from wagtail.admin.panels import FieldPanel
 from wagtail.images import get_image_model
 
 from blocks import blocks as custom_blocks
+from images.renditions import RenditionManifest
+from site_settings import page_urls, richtext
+from site_settings.listings import set_listing_urls
 
 
-class ProgramIndex(Page):
+class ProgramIndex(page_urls.SitemapUrlsMixin, Page):
     """
     A page that lists all programs.
     """
@@ -21,6 +24,9 @@ class ProgramIndex(Page):
     subtitle = models.CharField(max_length=100, blank=True)
     description = RichTextField(blank=True)  # optional description field
 
+    # logo rendition of the program cards, prefetched for the whole list
+    LISTING_RENDITION_SPECS = ["height-150"]
+
     body = StreamField(
         [
             ("six", custom_blocks.SixPhilosophiesBlock()),
@@ -47,13 +53,19 @@ class ProgramIndex(Page):
         Add the list of programs to the context.
         """
         context = super().get_context(request)
+        richtext.set_rendered([self], 'description')
         current_locale = Locale.get_active()
-        context['program_list'] = Program.objects.live().public().filter(locale=current_locale)
+        context['program_list'] = set_listing_urls(
+            list(Program.listing_queryset().filter(locale=current_locale)), request
+        )
+        RenditionManifest.for_request(request).prefetch(
+            context['program_list'], self.LISTING_RENDITION_SPECS, field_name='logo'
+        )
         return context
 
 
 # Create your models here.
-class Program(Page):
+class Program(page_urls.SitemapUrlsMixin, Page):
     """
     A page that displays specific information about a program.
     """
@@ -105,6 +117,20 @@ class Program(Page):
         null=True,
     )
 
+    # the rich text fields the detail page renders, see get_context()
+    RICH_TEXT_FIELDS = ["description", "tryouts", "equipment", "schedule", "location"]
+
+    # the columns program cards use, see listing_queryset()
+    LISTING_FIELDS = ["title", "path", "depth", "url_path", "locale", "subtitle", "ages", "logo"]
+
+    @classmethod
+    def listing_queryset(cls):
+        """
+        Live, public programs with only the columns program cards use (none of
+        the rich text fields or the body) and their logo.
+        """
+        return cls.objects.live().public().only(*cls.LISTING_FIELDS).select_related('logo')
+
     def custom_content(self):
         """
         A custom method to return the body content.
@@ -130,16 +156,14 @@ class Program(Page):
         Add all programs to the context for navigation,
         and any upcoming events linked to this program.
         """
-        from events.models import Event
-        from django.utils import timezone
+        from events.upcoming import get_upcoming_events
 
         context = super().get_context(request)
+        # the links and images of all the fields are resolved together
+        richtext.set_rendered([self], *self.RICH_TEXT_FIELDS)
         current_locale = Locale.get_active()
-        context['all_programs'] = Program.objects.live().public().filter(locale=current_locale)
-        context['program_events'] = (
-            Event.objects.filter(live=True, program=self, end_date__gte=timezone.now().date())
-            .order_by('start_date')
-        )
+        context['all_programs'] = Program.listing_queryset().filter(locale=current_locale)
+        context['program_events'] = get_upcoming_events().current_by_program.get(self.id, [])
         return context
 
     def clean(self):
@@ -0,0 +1,80 @@
+"""
+Buffered search query logging for the "Promoted search results" module.
+
+``Query.get(query).add_hit()`` does a get-or-create and an update of the
+day's hits row on the request path, so a burst of searches for the same query
+queues up on that row's lock. Instead, each process counts hits in memory and
+hands them to ``flush_query_hits_task`` in batches, which adds them to the
+daily hits with one update per query.
+
+Hits still in the buffer when a process stops are flushed on exit; a process
+that is killed loses them, which is acceptable for popularity statistics.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from wagtail.search.utils import normalise_query_string
+
+
+# flush once this many distinct (query, date) pairs are buffered...
+FLUSH_SIZE = getattr(settings, "SEARCH_HITS_FLUSH_SIZE", 50)
+# ...or the oldest buffered hit is this many seconds old
+FLUSH_INTERVAL = getattr(settings, "SEARCH_HITS_FLUSH_INTERVAL", 30)
+
+_lock = threading.Lock()
+# (normalized query string, date) -> hits
+_buffer = Counter()
+_buffer_started = None
+
+
+def record_hit(query_string):
+    """
+    Count a search for `query_string` today.
+    """
+    global _buffer_started
+
+    query_string = normalise_query_string(query_string)
+    if not query_string:
+        return
+
+    with _lock:
+        if not _buffer:
+            _buffer_started = time.monotonic()
+        _buffer[query_string, timezone.now().date()] += 1
+        due = len(_buffer) >= FLUSH_SIZE or time.monotonic() - _buffer_started >= FLUSH_INTERVAL
+
+    if due:
+        flush()
+
+
+def flush():
+    """
+    Hand the buffered hits to the background task and empty the buffer.
+    """
+    global _buffer
+
+    with _lock:
+        hits, _buffer = _buffer, Counter()
+    if not hits:
+        return
+
+    from search.tasks import flush_query_hits_task
+
+    # task arguments must be JSON serializable
+    flush_query_hits_task.enqueue(
+        [[query_string, date.isoformat(), count] for (query_string, date), count in hits.items()]
+    )
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        # the database may already be gone at interpreter shutdown
+        pass
@@ -0,0 +1,148 @@
+import random
+import statistics
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from wagtail.models import Page, Site
+from wagtail.search.backends import get_search_backend
+
+
+SYLLABLES = [
+    "ba", "ko", "ri", "ta", "mel", "sor", "vin", "do", "ga", "pe",
+    "lu", "nar", "chi", "fel", "os", "tra", "ken", "mu", "zo", "al",
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a synthetic corpus of pages and compare search backends: the time "
+        "to index the corpus and the latency of a set of queries against it. "
+        "Nothing is kept: the pages are created in a transaction that is rolled back. "
+        "Run it against PostgreSQL to measure the Postgres full-text backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=10_000,
+            help="Number of pages in the corpus",
+        )
+        parser.add_argument(
+            "--backend",
+            action="append",
+            dest="backends",
+            help=(
+                "Search backend to measure, a WAGTAILSEARCH_BACKENDS name or an import path "
+                "(can be repeated; default: the default backend and the unindexed fallback backend)"
+            ),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times each query is run",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=418,
+            help="Random seed for the corpus and the queries",
+        )
+
+    def handle(self, *args, **options):
+        site = Site.objects.filter(is_default_site=True).select_related("root_page").first()
+        if site is None:
+            raise CommandError("No default site found.")
+
+        backends = options["backends"] or ["default", "wagtail.search.backends.database.fallback"]
+        rng = random.Random(options["seed"])
+        vocabulary = build_vocabulary(rng, 2000)
+        # a few words are common, most are rare, like in real text
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+        self.stdout.write(f"Database: {connection.vendor}")
+        try:
+            with transaction.atomic():
+                parent = self.build_corpus(site.root_page, options["pages"], rng, vocabulary, weights)
+                queries = (
+                    # frequent, middling and rare single terms, then pairs
+                    [vocabulary[i] for i in (0, 5, 50, 500, 1500)]
+                    + [" ".join(rng.choices(vocabulary[:200], k=2)) for _ in range(5)]
+                )
+                for backend_name in backends:
+                    self.benchmark_backend(backend_name, parent, queries, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def build_corpus(self, site_root, count, rng, vocabulary, weights):
+        """
+        Create `count` plain pages below a new parent page with bulk inserts
+        (computing the treebeard paths here), which is much faster than add_child().
+        """
+        start = time.perf_counter()
+        parent = site_root.add_child(
+            instance=Page(title="Search benchmark", slug=f"search-benchmark-{time.time_ns()}")
+        )
+        content_type = ContentType.objects.get_for_model(Page)
+        pages = []
+        for i in range(1, count + 1):
+            title = " ".join(rng.choices(vocabulary, weights, k=rng.randint(4, 12)))
+            slug = f"page-{i}"
+            pages.append(Page(
+                title=title,
+                draft_title=title,
+                slug=slug,
+                path=Page._get_path(parent.path, parent.depth + 1, i),
+                depth=parent.depth + 1,
+                numchild=0,
+                url_path=f"{parent.url_path}{slug}/",
+                content_type=content_type,
+                locale_id=parent.locale_id,
+                live=True,
+            ))
+        Page.objects.bulk_create(pages, batch_size=1000)
+        Page.objects.filter(pk=parent.pk).update(numchild=count)
+        self.stdout.write(f"Created {count} pages in {time.perf_counter() - start:.1f} s")
+        return parent
+
+    def benchmark_backend(self, backend_name, parent, queries, repeat):
+        backend = get_search_backend(backend_name)
+        pages = Page.objects.live().descendant_of(parent)
+
+        start = time.perf_counter()
+        index = backend.get_index_for_model(Page)
+        if index is not None:
+            for offset in range(0, pages.count(), 1000):
+                index.add_items(Page, list(pages.order_by("path")[offset:offset + 1000]))
+        build_time = time.perf_counter() - start
+
+        timings = []
+        for query in queries:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(backend.search(query, pages, operator="or")[:10])
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+        self.stdout.write(
+            f"{type(backend).__name__} ({backend_name}): index built in {build_time:.1f} s, "
+            f"query latency p50 {statistics.median(timings) * 1000:.1f} ms, "
+            f"p95 {p95 * 1000:.1f} ms over {len(timings)} queries"
+        )
@@ -0,0 +1,299 @@
+"""
+In-memory prefix index for the search box typeahead.
+
+Each process keeps, per language, a sorted list of the lowercased titles of
+the live pages (programs included), published FAQ questions and published
+event titles, so a suggestion lookup is a binary search and never reaches the
+database. Every word of a title starts an entry, so "camp" finds
+"Summer Training Camp".
+
+The index is built when the process starts (see website/wsgi.py, or on the
+first lookup) and kept up to date by the signal receivers at the bottom of
+this module. The process that handles a publish updates its own index
+entry by entry and bumps a shared version, which makes the other processes
+rebuild theirs on their next lookup.
+"""
+import bisect
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils import translation
+from wagtail.models import Locale, Page
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+    published,
+    unpublished,
+)
+
+
+Suggestion = namedtuple("Suggestion", ["title", "url", "label"])
+
+VERSION_CACHE_KEY = "search-suggestions:version"
+
+# suggestions returned when the request doesn't ask for a number
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+_lock = threading.RLock()
+# (version, {language code: SuggestionIndex}) held by this process
+_process_indexes = (None, None)
+
+
+class SuggestionIndex:
+    """
+    The suggestions of one language, as a sorted list of
+    (lowercased title from a word on, source, suggestion) entries.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # source -> the entries it added, to remove them again
+        self.sources = {}
+
+    @staticmethod
+    def make_entries(source, suggestion):
+        words = suggestion.title.lower().split()
+        return [(" ".join(words[i:]), source, suggestion) for i in range(len(words))]
+
+    def add(self, source, suggestion):
+        self.remove(source)
+        entries = self.make_entries(source, suggestion)
+        for entry in entries:
+            bisect.insort(self.entries, entry)
+        self.sources[source] = entries
+
+    def remove(self, source):
+        for entry in self.sources.pop(source, []):
+            i = bisect.bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def lookup(self, prefix, limit):
+        """
+        Return up to `limit` suggestions with a title word starting with
+        `prefix`, in the alphabetical order of the matched words.
+        """
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        for key, source, suggestion in self.entries[bisect.bisect_left(self.entries, (prefix,)):]:
+            if not key.startswith(prefix):
+                break
+            if source not in seen:
+                seen.add(source)
+                results.append(suggestion)
+                if len(results) == limit:
+                    break
+        return results
+
+
+def page_url(page):
+    """
+    The URL of `page` in its own language, whichever language is active (the
+    index is built outside requests too).
+    """
+    if page is None:
+        return None
+    with translation.override(page.locale.language_code):
+        return page.get_url()
+
+
+def page_suggestion(page):
+    return Suggestion(page.title, page_url(page), "Page")
+
+
+def event_suggestion(event, events_page):
+    return Suggestion(event.title, event.link or page_url(events_page), "Event")
+
+
+def faq_suggestion(faq, faq_page):
+    return Suggestion(faq.question, page_url(faq_page), "FAQ")
+
+
+def suggestion_pages():
+    return Page.objects.live().filter(depth__gt=1).select_related("locale")
+
+
+def snippet_suggestions():
+    """
+    Return the (source, suggestion) pairs of the published events and FAQs,
+    which are shared by every language.
+    """
+    from events.models import Event, EventsPage
+    from faq.models import FAQPage
+    from site_settings.models import FAQ
+
+    events_page = EventsPage.objects.live().select_related("locale").first()
+    faq_page = FAQPage.objects.live().select_related("locale").first()
+    return [
+        (("event", event.pk), event_suggestion(event, events_page))
+        for event in Event.objects.filter(live=True).only("pk", "title", "link")
+    ] + [
+        (("faq", faq.pk), faq_suggestion(faq, faq_page))
+        for faq in FAQ.objects.filter(live=True).only("pk", "question")
+    ]
+
+
+def build_indexes():
+    """
+    Load every suggestion: three queries plus the two pages snippets link to.
+    """
+    indexes = {locale.language_code: SuggestionIndex() for locale in Locale.objects.all()}
+    for page in suggestion_pages():
+        index = indexes.setdefault(page.locale.language_code, SuggestionIndex())
+        index.add(("page", page.pk), page_suggestion(page))
+
+    for source, suggestion in snippet_suggestions():
+        for index in indexes.values():
+            index.add(source, suggestion)
+    return indexes
+
+
+def publish_indexes(indexes):
+    global _process_indexes
+
+    version = uuid.uuid4().hex
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    _process_indexes = (version, indexes)
+
+
+def get_indexes():
+    """
+    Return this process's indexes, rebuilding them if another process
+    published a change since they were built.
+    """
+    global _process_indexes
+
+    version = cache.get(VERSION_CACHE_KEY)
+    with _lock:
+        current_version, indexes = _process_indexes
+        if indexes is None:
+            indexes = build_indexes()
+            if version is None:
+                version = uuid.uuid4().hex
+                if not cache.add(VERSION_CACHE_KEY, version, timeout=None):
+                    version = cache.get(VERSION_CACHE_KEY, version)
+            _process_indexes = (version, indexes)
+        elif version is not None and version != current_version:
+            indexes = build_indexes()
+            _process_indexes = (version, indexes)
+        return indexes
+
+
+def get_suggestions(prefix, language_code, limit=DEFAULT_LIMIT):
+    index = get_indexes().get(language_code)
+    if index is None:
+        return []
+    return index.lookup(prefix, limit)
+
+
+def _update(change):
+    """
+    Apply `change(indexes)` to this process's indexes, if it has built them,
+    and tell the other processes to rebuild.
+    """
+    with _lock:
+        indexes = _process_indexes[1]
+        if indexes is not None:
+            change(indexes)
+            publish_indexes(indexes)
+        else:
+            cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def rebuild():
+    def change(indexes):
+        indexes.clear()
+        indexes.update(build_indexes())
+
+    _update(change)
+
+
+def page_changed(sender, instance, **kwargs):
+    from events.models import EventsPage
+    from faq.models import FAQPage
+
+    if isinstance(instance, (EventsPage, FAQPage)):
+        # the events and FAQs link to them
+        transaction.on_commit(rebuild)
+        return
+
+    page_id = instance.pk
+
+    def change(indexes):
+        page = suggestion_pages().filter(pk=page_id).first()
+        for index in indexes.values():
+            index.remove(("page", page_id))
+        if page is not None:
+            indexes.setdefault(page.locale.language_code, SuggestionIndex()).add(
+                ("page", page_id), page_suggestion(page)
+            )
+
+    transaction.on_commit(lambda: _update(change))
+
+
+def page_deleted(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        page_id = instance.pk
+
+        def change(indexes):
+            for index in indexes.values():
+                index.remove(("page", page_id))
+
+        transaction.on_commit(lambda: _update(change))
+
+
+def pages_moved(sender, **kwargs):
+    # the URLs of the whole subtree changed
+    transaction.on_commit(rebuild)
+
+
+def snippet_changed(sender, instance, **kwargs):
+    from events.models import Event, EventsPage
+    from faq.models import FAQPage
+
+    model = type(instance)
+    pk = instance.pk
+    source = ("event" if isinstance(instance, Event) else "faq", pk)
+
+    def change(indexes):
+        item = model.objects.filter(pk=pk, live=True).first()
+        if item is None:
+            suggestion = None
+        elif isinstance(item, Event):
+            suggestion = event_suggestion(item, EventsPage.objects.live().select_related("locale").first())
+        else:
+            suggestion = faq_suggestion(item, FAQPage.objects.live().select_related("locale").first())
+
+        for index in indexes.values():
+            if suggestion is None:
+                index.remove(source)
+            else:
+                index.add(source, suggestion)
+
+    transaction.on_commit(lambda: _update(change))
+
+
+def register_signal_handlers():
+    from events.models import Event
+    from site_settings.models import FAQ
+
+    page_published.connect(page_changed)
+    page_unpublished.connect(page_changed)
+    post_delete.connect(page_deleted)
+    post_page_move.connect(pages_moved)
+    page_slug_changed.connect(pages_moved)
+    for model in (Event, FAQ):
+        published.connect(snippet_changed, sender=model)
+        unpublished.connect(snippet_changed, sender=model)
+        post_delete.connect(snippet_changed, sender=model)
@@ -0,0 +1,35 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django_tasks import task
+
+from wagtail.contrib.search_promotions.models import Query, QueryDailyHits
+
+
+@task()
+def flush_query_hits_task(hits):
+    """
+    Add buffered search hits, a list of [query string, ISO date, hits], to the
+    daily hits of the promoted search results module.
+    """
+    query_strings = {query_string for query_string, _, _ in hits}
+    with transaction.atomic():
+        Query.objects.bulk_create(
+            [Query(query_string=query_string) for query_string in query_strings],
+            ignore_conflicts=True,
+        )
+        query_ids = dict(
+            Query.objects.filter(query_string__in=query_strings).values_list("query_string", "id")
+        )
+
+        new_rows = []
+        for query_string, date, count in hits:
+            query_id = query_ids[query_string]
+            date = datetime.date.fromisoformat(date)
+            updated = QueryDailyHits.objects.filter(query_id=query_id, date=date).update(
+                hits=F("hits") + count
+            )
+            if not updated:
+                new_rows.append(QueryDailyHits(query_id=query_id, date=date, hits=count))
+        QueryDailyHits.objects.bulk_create(new_rows)
@@ -1,50 +1,120 @@
+from collections import namedtuple
+
+from django.conf import settings
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.paginator import Page as PaginatorPage
+from django.http import JsonResponse
 from django.template.response import TemplateResponse
+from django.utils import translation
+from django.utils.html import strip_tags
 
 from wagtail.models import Locale, Page
-from wagtail.search.utils import parse_query_string
+from wagtail.search.backends import get_search_backend
+from wagtail.search.utils import normalise_query_string, parse_query_string
 
-# To enable logging of search queries for use with the "Promoted search results" module
-# <https://docs.wagtail.org/en/stable/reference/contrib/searchpromotions.html>
-# uncomment the following line and the lines indicated in the search function
-# (after adding wagtail.contrib.search_promotions to INSTALLED_APPS):
+from cta.models import CTA
+from events.models import Event, EventsPage
+from faq.models import FAQPage
+from search import suggestions
+from search.hits import record_hit
+from site_settings import cache as fragment_cache
+from site_settings.models import FAQ
 
-from wagtail.contrib.search_promotions.models import Query
+RESULTS_PER_PAGE = 10
 
+SEARCH_RESULTS_CACHE_TIMEOUT = getattr(settings, "SEARCH_RESULTS_CACHE_TIMEOUT", 60)
 
-def search(request):
-    search_query = request.GET.get("query", None)
-    page = request.GET.get("page", 1)
 
-    # Search
-    if search_query:
-        # parse query
-        filters, query_str = parse_query_string(search_query)
-
-        current_locale = Locale.get_active()
-
-        # start with all live pages
-        pages = Page.objects.live().filter(locale=current_locale)
-
-        # if adding filter support, do it here
-        # # Published filter
-        # # An example filter that accepts either `published:yes` or `published:no` and filters the pages accordingly
-        # published_filter = filters.get('published')
-        # published_filter = published_filter and published_filter.lower()
-        # if published_filter in ['yes', 'true']:
-        #     pages = pages.filter(live=True)
-        # elif published_filter in ['no', 'false']:
-        #     pages = pages.filter(live=False)
-
-        search_results = pages.search(query_str, operator="or")
-        # To log this query for use with the "Promoted search results" module:
-        query = Query.get(search_query)
-        query.add_hit()
-    else:
-        search_results = Page.objects.none()
+# A search hit on a snippet: events, FAQs and CTAs don't have pages of their own
+SnippetResult = namedtuple("SnippetResult", ["title", "description", "url", "label"])
+
+# results shown per snippet type, on the first page of results
+SNIPPET_RESULTS_LIMIT = 5
+
+
+def search_snippets(query_str):
+    """
+    Search the published events, FAQs and CTAs, linking each to the page that shows it.
+    """
+    backend = get_search_backend()
+    events_page = EventsPage.objects.live().first()
+    faq_page = FAQPage.objects.live().first()
+
+    results = []
+    for event in backend.search(query_str, Event.objects.filter(live=True).select_related("program"))[:SNIPPET_RESULTS_LIMIT]:
+        results.append(SnippetResult(
+            event.title,
+            event.subtitle or f"{event.start_date:%B} {event.start_date.day}, {event.start_date.year}",
+            event.link or (events_page.url if events_page else None),
+            "Event",
+        ))
+    for faq in backend.search(query_str, FAQ.objects.filter(live=True))[:SNIPPET_RESULTS_LIMIT]:
+        results.append(SnippetResult(
+            faq.question,
+            strip_tags(faq.answer),
+            faq_page.url if faq_page else None,
+            "FAQ",
+        ))
+    for cta in backend.search(query_str, CTA.objects.filter(live=True).select_related("button_page"))[:SNIPPET_RESULTS_LIMIT]:
+        results.append(SnippetResult(
+            cta.heading,
+            strip_tags(cta.text),
+            cta.get_button_url() or None,
+            "CTA",
+        ))
+    return results
+
+
+def get_search_results(search_query, page):
+    """
+    Return the paginated page results and the snippet results for `search_query`.
+
+    Popular queries are repeated a lot (think "registration" in August), so the
+    results are cached per locale, normalized query and results page for a
+    short while, and evicted by any publish.
+    """
+    current_locale = Locale.get_active()
+    number, count, results, snippet_results = fragment_cache.get_or_set(
+        fragment_cache.make_key(
+            "search-results", current_locale.pk, normalise_query_string(search_query), str(page)
+        ),
+        [fragment_cache.PAGES],
+        lambda: run_search(search_query, page, current_locale),
+        timeout=SEARCH_RESULTS_CACHE_TIMEOUT,
+    )
+
+    paginator = Paginator([], RESULTS_PER_PAGE)
+    # the total was counted when the results were cached
+    paginator.count = count
+    return PaginatorPage(results, number, paginator), snippet_results
+
+
+def run_search(search_query, page, current_locale):
+    """
+    Search the pages and snippets. Returns (page number, total, specific pages of
+    the requested results page, snippet results).
+    """
+    # parse query
+    filters, query_str = parse_query_string(search_query)
+
+    # start with all live pages
+    pages = Page.objects.live().filter(locale=current_locale)
+
+    # if adding filter support, do it here
+    # # Published filter
+    # # An example filter that accepts either `published:yes` or `published:no` and filters the pages accordingly
+    # published_filter = filters.get('published')
+    # published_filter = published_filter and published_filter.lower()
+    # if published_filter in ['yes', 'true']:
+    #     pages = pages.filter(live=True)
+    # elif published_filter in ['no', 'false']:
+    #     pages = pages.filter(live=False)
+
+    # any term matches; ranked by the backend's weighted relevance
+    search_results = pages.search(query_str, operator="or")
 
     # Pagination
-    paginator = Paginator(search_results, 10)
+    paginator = Paginator(search_results, RESULTS_PER_PAGE)
     try:
         search_results = paginator.page(page)
     except PageNotAnInteger:
@@ -52,11 +122,53 @@ def search(request):
     except EmptyPage:
         search_results = paginator.page(paginator.num_pages)
 
+    # the template shows specific fields, load them per page type in one go
+    specific_pages = Page.objects.filter(id__in=[result.id for result in search_results]).specific().in_bulk()
+    results = [specific_pages[result.id] for result in search_results if result.id in specific_pages]
+
+    snippet_results = search_snippets(query_str) if search_results.number == 1 else []
+    return search_results.number, paginator.count, results, snippet_results
+
+
+def search(request):
+    search_query = request.GET.get("query", None)
+    page = request.GET.get("page", 1)
+
+    # Search
+    if search_query:
+        search_results, snippet_results = get_search_results(search_query, page)
+        # To log this query for use with the "Promoted search results" module
+        # (buffered, see search.hits):
+        record_hit(search_query)
+    else:
+        search_results = Paginator(Page.objects.none(), RESULTS_PER_PAGE).page(1)
+        snippet_results = []
+
     return TemplateResponse(
         request,
         "search/search.html",
         {
             "search_query": search_query,
             "search_results": search_results,
+            "snippet_results": snippet_results,
         },
     )
+
+
+def suggest(request):
+    """
+    Typeahead for the search box: the titles starting with (a word starting
+    with) the `query` prefix, as JSON. Served from the in-memory prefix index,
+    see search.suggestions.
+    """
+    prefix = request.GET.get("query", "")
+    try:
+        limit = min(int(request.GET.get("limit", suggestions.DEFAULT_LIMIT)), suggestions.MAX_LIMIT)
+    except ValueError:
+        limit = suggestions.DEFAULT_LIMIT
+
+    results = suggestions.get_suggestions(prefix, translation.get_language(), max(limit, 1))
+    return JsonResponse({
+        "query": prefix,
+        "suggestions": [suggestion._asdict() for suggestion in results],
+    })
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class SiteSettingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'site_settings'
+
+    def ready(self):
+        from site_settings import page_urls
+        from site_settings.signals import register_signal_handlers
+
+        register_signal_handlers()
+        page_urls.register_signal_handlers()
@@ -0,0 +1,95 @@
+"""
+Published-state snapshot of the active announcement banner.
+
+The snapshot (pre-rendered title, content as plain text, color and id) is written
+when a banner is published, unpublished, deleted or toggled in Banner.save().
+Each worker process keeps its own copy in memory and only re-reads it from the
+cache when the shared version key changes, so the banner context processor
+doesn't touch the database on page views.
+"""
+import html
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils.html import strip_tags
+
+from wagtail.rich_text import expand_db_html
+
+from site_settings import cache as fragment_cache
+
+
+BannerSnapshot = namedtuple("BannerSnapshot", ["id", "title", "content", "color"])
+
+VERSION_CACHE_KEY = "active-banner:version"
+SNAPSHOT_CACHE_KEY = "active-banner:snapshot"
+
+# (version, snapshot) held by this process
+_process_snapshot = (None, None)
+
+
+def build_snapshot():
+    """
+    Load the active, live banner from the database and pre-render it.
+    """
+    from site_settings.models import Banner
+
+    banner = (
+        Banner.objects.filter(is_active=True, live=True)
+        .only("id", "title", "content", "color")
+        .first()
+    )
+    if banner is None:
+        return None
+
+    return BannerSnapshot(
+        id=banner.id,
+        title=banner.title,
+        # plain text, the template escapes it
+        content=html.unescape(strip_tags(expand_db_html(banner.content))).strip(),
+        color=banner.color,
+    )
+
+
+def publish_snapshot():
+    """
+    Rebuild the snapshot and share it with every process.
+    """
+    global _process_snapshot
+
+    version = uuid.uuid4().hex
+    snapshot = build_snapshot()
+    cache.set(SNAPSHOT_CACHE_KEY, (version, snapshot), timeout=None)
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    _process_snapshot = (version, snapshot)
+    # every page shows the banner
+    fragment_cache.invalidate(fragment_cache.PAGES)
+
+
+def get_active_banner():
+    """
+    Return the BannerSnapshot of the active banner, or None.
+    """
+    global _process_snapshot
+
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is not None and version == _process_snapshot[0]:
+        return _process_snapshot[1]
+
+    cached = cache.get(SNAPSHOT_CACHE_KEY)
+    if cached is None:
+        # cold cache (or a cache that doesn't persist, like DummyCache in dev)
+        try:
+            cached = (uuid.uuid4().hex, build_snapshot())
+        except DatabaseError:
+            # the banner table doesn't exist yet, e.g. before the first migrate
+            return None
+        # don't overwrite a snapshot written by a concurrent publish
+        if not cache.add(SNAPSHOT_CACHE_KEY, cached, timeout=None):
+            cached = cache.get(SNAPSHOT_CACHE_KEY, cached)
+
+    if version != cached[0]:
+        cache.set(VERSION_CACHE_KEY, cached[0], timeout=None)
+    _process_snapshot = cached
+    return cached[1]
@@ -0,0 +1,250 @@
+"""
+Dependency-tracked fragment cache.
+
+Rendered fragments (navbar, news carousels, program and FAQ lists, ...) register
+the pages, snippets and models they were built from. Publishing, unpublishing or
+deleting one of those objects bumps the version of its dependency keys, which
+evicts only the fragments that depend on it instead of clearing the whole cache.
+
+Usage:
+    from site_settings import cache as fragment_cache
+
+    html = fragment_cache.get_or_set(
+        fragment_cache.make_key("programs", request.get_host(), language),
+        [Program],
+        lambda: render_to_string(...),
+    )
+
+    # in a publish signal handler
+    fragment_cache.invalidate(Program, program)
+"""
+import hashlib
+import json
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from wagtail.models import Page
+
+
+FRAGMENT_KEY_PREFIX = "fragment"
+DEPENDENCY_KEY_PREFIX = "fragment-dependency"
+
+# dependencies that aren't tied to a single model
+MENU = "menu"  # pages shown in the navbar
+PAGE_URLS = "page-urls"  # any page move or slug change
+PAGES = "pages"  # full page responses, evicted by every invalidation
+
+# hit/miss counters for this process, used by the benchmark command
+stats = Counter()
+
+
+def dependency_key(obj):
+    """
+    Return the dependency key for a model class, a model instance or a plain string.
+
+    Pages always map to ``page:<id>`` regardless of their specific class so that
+    a fragment depending on a ``Page`` and one depending on the ``NewsItem`` are
+    evicted together.
+    """
+    if isinstance(obj, str):
+        return obj
+    if isinstance(obj, type):
+        return f"model:{obj._meta.label_lower}"
+    return reference_dependency_key(type(obj), obj.pk)
+
+
+def reference_dependency_key(model, pk):
+    """
+    Return the dependency key for the `model` instance with primary key `pk`,
+    without loading it (e.g. for the objects a block value references).
+    """
+    if issubclass(model, Page):
+        return f"page:{pk}"
+    return f"{model._meta.label_lower}:{pk}"
+
+
+def locale_dependency_key(model, locale_id):
+    """
+    Return the dependency key for the instances of `model` in one locale.
+    """
+    return f"model:{model._meta.label_lower}:locale:{locale_id}"
+
+
+def children_dependency_key(parent_path):
+    """
+    Return the dependency key for the children of the page at `parent_path`.
+    """
+    return f"page-children:{parent_path}"
+
+
+def subtree_dependency_key(ancestor_path):
+    """
+    Return the dependency key for all the pages below the page at `ancestor_path`.
+    """
+    return f"page-subtree:{ancestor_path}"
+
+
+def make_key(*parts):
+    """
+    Build a fragment cache key from arbitrary (JSON serializable) parts.
+    """
+    digest = hashlib.md5(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{FRAGMENT_KEY_PREFIX}:{digest}"
+
+
+def _version_key(dependency):
+    return f"{DEPENDENCY_KEY_PREFIX}:{dependency}"
+
+
+def get_versioned(key, dependencies):
+    """
+    Fetch the cached entry for `key` and the current dependency versions in a
+    single cache round trip.
+
+    Returns a ``(versions, cached)`` tuple where cached is the stored
+    ``(versions, value)`` tuple, whether or not it is still current, or None.
+    Missing versions (never set or evicted) are initialised with a fresh token,
+    which safely invalidates any entry that was stored against the old one.
+    """
+    version_keys = {_version_key(dependency_key(dep)): dependency_key(dep) for dep in dependencies}
+    found = cache.get_many([key, *version_keys])
+
+    missing = {
+        version_key: uuid.uuid4().hex
+        for version_key in version_keys
+        if version_key not in found
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    versions = {version_keys[version_key]: found[version_key] for version_key in version_keys}
+    return versions, found.get(key)
+
+
+def _lookup(key, dependencies):
+    """
+    Like get_versioned(), but the value is None when the entry is missing or
+    was stored against older dependency versions.
+    """
+    versions, cached = get_versioned(key, dependencies)
+    if cached is None or cached[0] != versions:
+        stats["misses"] += 1
+        return versions, None
+
+    stats["hits"] += 1
+    return versions, cached[1]
+
+
+def get_fragment(key, dependencies):
+    """
+    Return the cached value for `key`, or None if it is missing or any of its
+    dependencies changed since it was stored.
+    """
+    return _lookup(key, dependencies)[1]
+
+
+def get_or_set(key, dependencies, builder, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value for `key`, calling `builder()` to rebuild it when
+    it is missing or stale.
+
+    The value is stored against the dependency versions read *before* building,
+    so an invalidation that lands mid-build leaves the new entry already stale.
+    """
+    versions, value = _lookup(key, dependencies)
+    if value is None:
+        value = builder()
+        cache.set(key, (versions, value), timeout)
+    return value
+
+
+def get_or_set_many(entries, builder, timeout=DEFAULT_TIMEOUT):
+    """
+    get_or_set() for many fragments at once: `entries` maps each key to its
+    dependencies, `builder(keys)` returns a {key: value} dict for the keys that
+    were missing or stale. Returns a {key: value} dict for all the keys, with a
+    single cache read for the lookups and a single write for the rebuilt
+    fragments.
+    """
+    version_keys = {
+        _version_key(dependency_key(dep)): dependency_key(dep)
+        for dependencies in entries.values()
+        for dep in dependencies
+    }
+    found = cache.get_many([*entries, *version_keys])
+
+    missing_versions = {
+        version_key: uuid.uuid4().hex
+        for version_key in version_keys
+        if version_key not in found
+    }
+    if missing_versions:
+        cache.set_many(missing_versions, timeout=None)
+        found.update(missing_versions)
+
+    values = {}
+    stale = {}
+    for key, dependencies in entries.items():
+        versions = {
+            dependency_key(dep): found[_version_key(dependency_key(dep))] for dep in dependencies
+        }
+        cached = found.get(key)
+        if cached is not None and cached[0] == versions:
+            stats["hits"] += 1
+            values[key] = cached[1]
+        else:
+            stats["misses"] += 1
+            stale[key] = versions
+
+    if stale:
+        built = builder(list(stale))
+        cache.set_many({key: (stale[key], built[key]) for key in stale}, timeout)
+        values.update(built)
+    return values
+
+
+def invalidate(*dependencies):
+    """
+    Evict every fragment that depends on any of the given dependencies.
+
+    Full page responses embed every fragment, so they are evicted along with
+    any of them.
+
+    Runs after the current transaction commits so a concurrent request can't
+    re-cache data that is about to change.
+    """
+    keys = [_version_key(dependency_key(dep)) for dep in [*dependencies, PAGES]]
+
+    def bump_versions():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+    transaction.on_commit(bump_versions)
+
+
+def invalidate_object(instance):
+    """
+    Evict every fragment that depends on `instance` or on its model, and for
+    translatable objects on its model in the instance's locale. Pages also evict
+    the lists of their parent's children and the trees of their ancestors.
+    """
+    model = type(instance)
+    if isinstance(instance, Page):
+        model = instance.specific_class or model
+    dependencies = [instance, model]
+    if isinstance(instance, Page) and instance.path:
+        # lists of the parent's children, and trees built from any ancestor
+        dependencies.append(children_dependency_key(instance.path[:-instance.steplen]))
+        dependencies.extend(
+            subtree_dependency_key(instance.path[:end])
+            for end in range(instance.steplen, len(instance.path), instance.steplen)
+        )
+    if getattr(instance, "locale_id", None) is not None:
+        dependencies.append(locale_dependency_key(model, instance.locale_id))
+    invalidate(*dependencies)
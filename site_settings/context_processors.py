@@ -1,55 +1,116 @@
+from collections import namedtuple
+
+from django.utils import translation
+
 from wagtail.models import Page, Locale, Site
-from site_settings.models import Banner
+from site_settings import cache as fragment_cache
+from site_settings import page_urls
+from site_settings.banner import get_active_banner
 from programs.models import Program
 
 
+# A compact, immutable menu entry. children is a tuple of MenuItems.
+MenuItem = namedtuple("MenuItem", ["id", "title", "url", "children"])
+Menu = namedtuple("Menu", ["pages", "programs"])
+
+
 def navbar(request):
     """Context processor to add the navbar pages to the context.
     This will show all pages if the user is authenticated, otherwise
     it will show only the public pages.
 
+    The menu tree is built once per (site, locale, authenticated/anonymous) and
+    kept in the cache until a page's show_in_menus, live, title, slug or position
+    changes, so rendering the menu costs no queries on a warm cache.
+
     This function is called in the settings in the
     TEMPLATES['OPTIONS']['context_processors'] list.
     """
     # Get the current site based on the request
     current_site = Site.find_for_request(request)
-    root_page = current_site.root_page
-    # this is currently UNUSED but left here for future use
-    if request.user.is_authenticated:
-        # If the user is authenticated, show all pages
-        root_nav = root_page.get_children().live().in_menu().filter(locale=Locale.get_active())
-        program_nav = Program.objects.live().in_menu().filter(locale=Locale.get_active())
-    else:
-        root_nav = root_page.get_children().live().in_menu().public().filter(locale=Locale.get_active())
-        program_nav = Program.objects.live().in_menu().public().filter(locale=Locale.get_active())
+    if current_site is None:
+        return {"navbar_pages": (), "program_pages": ()}
+
+    authenticated = request.user.is_authenticated
+    key = fragment_cache.make_key(
+        "navbar-tree", current_site.pk, translation.get_language(), authenticated
+    )
+    menu = fragment_cache.get_or_set(
+        key,
+        [fragment_cache.MENU, fragment_cache.PAGE_URLS],
+        lambda: _build_menu(request, current_site, authenticated),
+    )
 
     return {
-        "navbar_pages": root_nav,
-        "program_pages": program_nav
+        "navbar_pages": menu.pages,
+        "program_pages": menu.programs,
     }
 
 
+def _build_menu(request, site, authenticated):
+    """
+    Load the top two levels of the menu for the site's root page in the active
+    locale with a single treebeard path query, and group them into MenuItems.
+    """
+    locale = Locale.get_active()
+    root_page = site.root_page.get_translation_or_none(locale) or site.root_page
+
+    menu_pages = (
+        Page.objects.filter(
+            path__startswith=root_page.path,
+            depth__in=(root_page.depth + 1, root_page.depth + 2),
+        )
+        .live()
+        .in_menu()
+        .filter(locale=locale)
+        .only("id", "path", "depth", "title", "url_path")
+        .order_by("path")
+    )
+    program_pages = (
+        Program.objects.live().in_menu().filter(locale=locale)
+        .only("id", "title", "url_path")
+    )
+    if not authenticated:
+        # anonymous users only see public pages
+        menu_pages = menu_pages.public()
+        program_pages = program_pages.public()
+
+    children_by_parent_path = {}
+    for page in menu_pages:
+        if page.depth == root_page.depth + 2:
+            children_by_parent_path.setdefault(page.path[:-Page.steplen], []).append(
+                MenuItem(page.id, page.title, page_urls.get_url(page, request), ())
+            )
+
+    pages = tuple(
+        MenuItem(
+            page.id,
+            page.title,
+            page_urls.get_url(page, request),
+            tuple(children_by_parent_path.get(page.path, ())),
+        )
+        for page in menu_pages
+        if page.depth == root_page.depth + 1
+    )
+    programs = tuple(
+        MenuItem(page.id, page.title, page_urls.get_url(page, request), ())
+        for page in program_pages
+    )
+    return Menu(pages, programs)
+
+
 def active_banner(request):
     """Context processor to add the active banner to the context.
 
     Only returns live (published) banners that are marked as active.
     Users can dismiss banners which are tracked in session storage.
 
+    The banner is read from a snapshot that is kept in memory and refreshed
+    when a banner is published, unpublished or toggled, see site_settings.banner.
+
     This function is called in the settings in the
     TEMPLATES['OPTIONS']['context_processors'] list.
     """
-    try:
-        # Get the active banner that is also live (published)
-        banner = Banner.objects.filter(
-            is_active=True,
-            live=True
-        ).first()
-
-        return {
-            "active_banner": banner
-        }
-    except Exception:
-        # If there's any error (e.g., table doesn't exist yet), return None
-        return {
-            "active_banner": None
-        }
+    return {
+        "active_banner": get_active_banner()
+    }
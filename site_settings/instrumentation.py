@@ -0,0 +1,341 @@
+"""
+Per-request instrumentation: SQL queries and time, cache gets and misses,
+template and StreamField block render time.
+
+RequestMetricsMiddleware measures every request and
+
+- adds a Server-Timing header when REQUEST_METRICS_SERVER_TIMING is set (in
+  development only), so the numbers show up in the browser's network panel;
+- checks the query count against the budget of the page type in
+  QUERY_BUDGETS, logging a warning (or raising QueryBudgetExceeded when
+  QUERY_BUDGET_RAISE is set, as in the tests) when it is exceeded;
+- keeps a sample of the requests (REQUEST_METRICS_SAMPLE_RATE), buffered per
+  process and written in batches by a background task, for
+  ``manage.py request_metrics``.
+
+On sampled requests every StreamField block render is profiled as well (see
+profile_block()): its own time, queries and output size, with the stream
+child id and page it belongs to, for the "Block render times" report.
+
+Requests are labelled with the Wagtail page type and routable sub-route
+(``NewsIndex:news_items_by_tag``, see the before_serve_page hook in
+wagtail_hooks.py), the URL name for other views, or ``page-cache`` for full-page
+cache hits. Only counts and timings are kept, never SQL or URLs.
+"""
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from wagtail.blocks import StreamValue
+from wagtail.models import Page
+
+
+logger = logging.getLogger(__name__)
+
+# flush the buffered samples once there are this many...
+FLUSH_SIZE = getattr(settings, "REQUEST_METRICS_FLUSH_SIZE", 100)
+# ...or the oldest is this many seconds old
+FLUSH_INTERVAL = getattr(settings, "REQUEST_METRICS_FLUSH_INTERVAL", 60)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+_lock = threading.Lock()
+_samples = []
+_samples_started = None
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    """
+    The measurements of one request. Times are in seconds.
+    """
+
+    def __init__(self):
+        self.label = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_gets = 0
+        self.cache_misses = 0
+        # seconds per kind of rendering ("template", "blocks")
+        self.render_time = {}
+        # kinds being timed right now, nested renders of the same kind aren't added twice
+        self._tracking = set()
+        # whether the request is kept, decided up front so blocks know whether to profile
+        self.sampled = False
+        # the block profiles of a sampled request
+        self.blocks = []
+        # stream child ids of the blocks being rendered, nested blocks take their parent's
+        self._block_ids = []
+
+    def as_sample(self):
+        return {
+            "label": self.label or "unknown",
+            "duration_ms": self.duration * 1000,
+            "queries": self.queries,
+            "db_ms": self.db_time * 1000,
+            "cache_gets": self.cache_gets,
+            "cache_misses": self.cache_misses,
+            "template_ms": self.render_time.get("template", 0.0) * 1000,
+            "blocks_ms": self.render_time.get("blocks", 0.0) * 1000,
+            "blocks": self.blocks,
+        }
+
+    def server_timing(self):
+        """
+        Return the value of the Server-Timing header.
+        """
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_gets} gets, {self.cache_misses} misses"',
+        ]
+        for kind, seconds in self.render_time.items():
+            metrics.append(f"{kind};dur={seconds * 1000:.1f}")
+        metrics.append(f'app;dur={self.duration * 1000:.1f};desc="{self.label or "unknown"}"')
+        return ", ".join(metrics)
+
+
+def get_current_metrics():
+    """
+    Return the RequestMetrics of the request being handled, or None.
+    """
+    return _current.get()
+
+
+def set_label(label):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.label = label
+
+
+@contextlib.contextmanager
+def track(kind):
+    """
+    Add the time spent in the block to the current request's `kind` render time.
+    """
+    metrics = _current.get()
+    if metrics is None or kind in metrics._tracking:
+        yield
+        return
+
+    metrics._tracking.add(kind)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._tracking.discard(kind)
+        metrics.render_time[kind] = metrics.render_time.get(kind, 0.0) + time.perf_counter() - start
+
+
+def stream_child_id(value, context):
+    """
+    Return the id of the stream child being rendered with `value`: the loop
+    variable of ``{% for section in page.body %}{% include_block section %}``
+    is in the template context.
+    """
+    if context is None:
+        return None
+    for values in reversed(getattr(context, "dicts", [context])):
+        for candidate in values.values():
+            if isinstance(candidate, StreamValue.StreamChild) and candidate.value is value:
+                return candidate.id
+    return None
+
+
+def profile_block(block, value, context, render):
+    """
+    Return `render()`, adding the time to the current request's block render
+    time and, on sampled requests, recording the block's own measurements.
+    Nested blocks are recorded too, under the stream child id of the block
+    they're in; their time is also part of the outer block's.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return render()
+
+    with track("blocks"):
+        if not metrics.sampled:
+            return render()
+
+        block_id = stream_child_id(value, context) or (metrics._block_ids[-1] if metrics._block_ids else None)
+        page = context.get("page") if context is not None else None
+        metrics._block_ids.append(block_id)
+        start, queries = time.perf_counter(), metrics.queries
+        try:
+            html = render()
+        finally:
+            metrics._block_ids.pop()
+        metrics.blocks.append({
+            "block_type": type(block).__name__,
+            "block_id": block_id or "",
+            "page_id": page.pk if isinstance(page, Page) else None,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+            "queries": metrics.queries - queries,
+            "output_bytes": len(str(html).encode("utf-8")),
+        })
+        return html
+
+
+def _count_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - start
+
+
+def _instrument_cache(backend):
+    """
+    Count the gets and misses of a cache backend. Backends are per thread, each
+    is wrapped once.
+    """
+    if getattr(backend, "_request_metrics", False):
+        return
+
+    get, get_many = backend.get, backend.get_many
+
+    def counting_get(key, default=None, version=None):
+        value = get(key, default, version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_gets += 1
+            if value is default:
+                metrics.cache_misses += 1
+        return value
+
+    def counting_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_gets += len(keys)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get = counting_get
+    if type(backend).get_many is not BaseCache.get_many:
+        # the default get_many() calls get(), which already counts
+        backend.get_many = counting_get_many
+    backend._request_metrics = True
+
+
+def get_budget(label):
+    """
+    Return the query budget for `label`: the budget of the exact label
+    ("NewsIndex:news_items_by_tag") or else of its page type ("NewsIndex").
+    """
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    if label in budgets:
+        return budgets[label]
+    return budgets.get(label.split(":", 1)[0], getattr(settings, "QUERY_BUDGET_DEFAULT", None))
+
+
+def check_budget(metrics):
+    label = metrics.label or "unknown"
+    budget = get_budget(label)
+    if budget is None or metrics.queries <= budget:
+        return
+
+    message = f"{label} ran {metrics.queries} queries, over its budget of {budget}"
+    if getattr(settings, "QUERY_BUDGET_RAISE", False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def record_sample(metrics):
+    """
+    Buffer the measurements of a request and hand them to the background task
+    in batches.
+    """
+    global _samples_started
+
+    with _lock:
+        if not _samples:
+            _samples_started = time.monotonic()
+        _samples.append(metrics.as_sample())
+        due = len(_samples) >= FLUSH_SIZE or time.monotonic() - _samples_started >= FLUSH_INTERVAL
+
+    if due:
+        flush()
+
+
+def flush():
+    global _samples
+
+    with _lock:
+        samples, _samples = _samples, []
+    if not samples:
+        return
+
+    from site_settings.tasks import store_request_samples_task
+
+    store_request_samples_task.enqueue(samples)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure each request. Goes first, so it includes the other middleware
+    (and full-page cache hits).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        metrics.sampled = random.random() < getattr(settings, "REQUEST_METRICS_SAMPLE_RATE", 0)
+        token = _current.set(metrics)
+        try:
+            for backend in caches.all():
+                _instrument_cache(backend)
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_count_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.duration = time.perf_counter() - metrics.started
+
+        if metrics.label is None:
+            if response.headers.get("X-Page-Cache") in ("HIT", "STALE"):
+                metrics.label = "page-cache"
+            elif getattr(request, "resolver_match", None) is not None:
+                metrics.label = request.resolver_match.view_name
+
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", settings.DEBUG):
+            response.headers["Server-Timing"] = metrics.server_timing()
+        check_budget(metrics)
+        if metrics.sampled:
+            record_sample(metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # runs right before the response is rendered
+        metrics = _current.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time["template"] = (
+                    metrics.render_time.get("template", 0.0) + time.perf_counter() - start
+                )
+
+            response.add_post_render_callback(rendered)
+        return response
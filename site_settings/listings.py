@@ -0,0 +1,20 @@
+"""
+Helpers for pages listed as cards (news, programs).
+
+Listings load their pages with ``Model.listing_queryset()``, which only reads
+the columns the cards show (not the StreamField body or the other rich text
+fields), and call set_listing_urls() on the fetched pages so templates can use
+``page.listing_url`` instead of ``page.url``: ``page.url`` looks up the site
+root paths again for every card.
+"""
+from site_settings import page_urls
+
+
+def set_listing_urls(pages, request=None):
+    """
+    Set `listing_url` on each of `pages` from the page URL map (see
+    site_settings.page_urls) and return them.
+    """
+    for page in pages:
+        page.listing_url = page_urls.get_url(page, request)
+    return pages
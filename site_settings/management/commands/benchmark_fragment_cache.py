@@ -0,0 +1,86 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import translation
+
+from wagtail.models import Site
+
+from news.models import NewsItem
+from site_settings import cache as fragment_cache
+
+
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark-fragment-cache",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish one news item and measure the fragment cache hit ratio on the home page "
+        "afterwards, compared to clearing the whole cache on publish. "
+        "Note: this republishes the most recent news item in the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=10,
+            help="Number of home page requests to measure after the publish",
+        )
+
+    def handle(self, *args, **options):
+        site = Site.objects.filter(is_default_site=True).select_related("root_page").first()
+        if site is None:
+            raise CommandError("No default site found.")
+
+        news_item = NewsItem.objects.live().order_by("-last_published_at").first()
+        if news_item is None:
+            raise CommandError("No live news item found to publish.")
+
+        # DummyCache (the dev default) would make every lookup a miss
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            client = Client(HTTP_HOST=site.hostname)
+            with translation.override(site.root_page.locale.language_code):
+                home_url = site.root_page.url
+
+            def publish_news_item():
+                news_item.save_revision().publish()
+
+            def clear_cache():
+                publish_news_item()
+                cache.clear()
+
+            for label, on_publish in [
+                ("dependency tracking", publish_news_item),
+                ("cache.clear()", clear_cache),
+            ]:
+                cache.clear()
+                client.get(home_url)  # warm up
+                on_publish()
+
+                # the first request after a publish is the one that pays for rebuilds
+                timings = []
+                fragment_cache.stats.clear()
+                for i in range(options["requests"]):
+                    start = time.perf_counter()
+                    response = client.get(home_url)
+                    timings.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise CommandError(f"{home_url} returned {response.status_code}")
+                    if i == 0:
+                        first_stats = dict(fragment_cache.stats)
+
+                hits = first_stats.get("hits", 0)
+                total = hits + first_stats.get("misses", 0)
+                ratio = hits / total if total else 0
+                self.stdout.write(
+                    f"{label}: {hits}/{total} fragment hits ({ratio:.0%}) on the first request, "
+                    f"{timings[0] * 1000:.1f} ms first request, "
+                    f"{sum(timings) / len(timings) * 1000:.1f} ms average over {len(timings)} requests"
+                )
@@ -0,0 +1,88 @@
+import datetime
+import math
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from site_settings import instrumentation
+from site_settings.models import RequestSample
+
+
+METRICS = ["duration_ms", "queries", "db_ms", "cache_misses", "template_ms", "blocks_ms"]
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Print p50/p95/p99 of the sampled request measurements (duration, queries, "
+        "DB time, cache misses, template and block render time) per page type "
+        "and route, slowest first. See site_settings.instrumentation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=24,
+            help="Only use the samples of the last HOURS hours",
+        )
+        parser.add_argument(
+            "--label",
+            help="Only report this label (e.g. NewsItem or NewsIndex:news_items_by_tag)",
+        )
+        parser.add_argument(
+            "--prune",
+            type=int,
+            metavar="DAYS",
+            help="Delete the samples (and their block profiles) older than DAYS days first",
+        )
+
+    def handle(self, *args, **options):
+        if options["prune"] is not None:
+            deleted, _ = RequestSample.objects.filter(
+                created_at__lt=timezone.now() - datetime.timedelta(days=options["prune"])
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} samples.")
+
+        samples = RequestSample.objects.filter(
+            created_at__gte=timezone.now() - datetime.timedelta(hours=options["hours"])
+        )
+        if options["label"]:
+            samples = samples.filter(label=options["label"])
+
+        values = {}
+        for row in samples.values_list("label", *METRICS).iterator():
+            by_metric = values.setdefault(row[0], {metric: [] for metric in METRICS})
+            for metric, value in zip(METRICS, row[1:]):
+                by_metric[metric].append(value)
+        if not values:
+            self.stdout.write("No samples.")
+            return
+
+        rows = []
+        for label, by_metric in values.items():
+            for metric_values in by_metric.values():
+                metric_values.sort()
+            rows.append((label, by_metric))
+        rows.sort(key=lambda row: percentile(row[1]["duration_ms"], 0.95), reverse=True)
+
+        for label, by_metric in rows:
+            budget = instrumentation.get_budget(label)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{label}: {len(by_metric['duration_ms'])} requests"
+                + (f", query budget {budget}" if budget is not None else "")
+            ))
+            for metric in METRICS:
+                metric_values = by_metric[metric]
+                self.stdout.write(
+                    f"  {metric:<13} p50 {percentile(metric_values, 0.5):>9.1f}"
+                    f"  p95 {percentile(metric_values, 0.95):>9.1f}"
+                    f"  p99 {percentile(metric_values, 0.99):>9.1f}"
+                    f"  max {metric_values[-1]:>9.1f}"
+                )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_settings', '0003_alter_banner_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('label', models.CharField(max_length=255)),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField()),
+                ('db_ms', models.FloatField()),
+                ('cache_gets', models.PositiveIntegerField()),
+                ('cache_misses', models.PositiveIntegerField()),
+                ('template_ms', models.FloatField()),
+                ('blocks_ms', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['label', 'created_at'], name='requestsample_label_idx')],
+            },
+        ),
+    ]
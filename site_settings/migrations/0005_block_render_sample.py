@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_settings', '0004_request_sample'),
+        ('wagtailcore', '0096_referenceindex_referenceindex_source_object_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockRenderSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_type', models.CharField(max_length=100)),
+                ('block_id', models.CharField(blank=True, max_length=64)),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField()),
+                ('output_bytes', models.PositiveIntegerField()),
+                ('page', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.page')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='site_settings.requestsample')),
+            ],
+        ),
+    ]
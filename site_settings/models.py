@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.fields import GenericRelation
 
@@ -165,6 +165,7 @@ class FAQ(
         index.SearchField('question', boost=10),
         index.SearchField('answer'),
         index.FilterField('category'),
+        index.FilterField('live'),
     ]
 
     def __str__(self):
@@ -248,7 +249,59 @@ class Banner(
             Banner.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
         super().save(*args, **kwargs)
 
+        # the update() above doesn't send signals, so refresh the banner snapshot here
+        from site_settings.banner import publish_snapshot
+        transaction.on_commit(publish_snapshot)
+
     class Meta:
         verbose_name = "Banner"
         verbose_name_plural = "Banners"
-        ordering = ['-is_active', '-pk']
\ No newline at end of file
+        ordering = ['-is_active', '-pk']
+
+
+class RequestSample(models.Model):
+    """
+    The measurements of one sampled request, see site_settings.instrumentation.
+    """
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # page type and routable sub-route ("NewsIndex:news_items_by_tag"), URL name or "page-cache"
+    label = models.CharField(max_length=255)
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+    cache_gets = models.PositiveIntegerField()
+    cache_misses = models.PositiveIntegerField()
+    template_ms = models.FloatField()
+    blocks_ms = models.FloatField()
+
+    def __str__(self):
+        return f"{self.label} ({self.duration_ms:.0f} ms, {self.queries} queries)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["label", "created_at"], name="requestsample_label_idx"),
+        ]
+
+
+class BlockRenderSample(models.Model):
+    """
+    The render of one StreamField block on a sampled request, see
+    site_settings.instrumentation.profile_block().
+    """
+    request = models.ForeignKey(RequestSample, on_delete=models.CASCADE, related_name="blocks")
+    page = models.ForeignKey(
+        "wagtailcore.Page",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    block_type = models.CharField(max_length=100)
+    # the stream child the block is (or is nested) in
+    block_id = models.CharField(max_length=64, blank=True)
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    output_bytes = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.block_type} {self.block_id} ({self.duration_ms:.1f} ms, {self.queries} queries)"
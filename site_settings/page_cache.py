@@ -0,0 +1,182 @@
+"""
+Full-page cache for anonymous visitors.
+
+PageCacheMiddleware answers anonymous GET/HEAD requests from the cache before
+Wagtail routes the request, so a hit skips the page lookup, the context
+processors and every block. Responses are only stored when Wagtail served a
+page that opted in through the before_serve_page hook (see wagtail_hooks.py),
+which leaves out private and password protected pages, form pages, previews
+and anything that sets a cookie.
+
+Entries depend on fragment_cache.PAGES, which every fragment invalidation bumps,
+so publishing anything evicts them. A stale entry (invalidated or older than
+PAGE_CACHE_TIMEOUT) is still served for up to PAGE_CACHE_STALE_TIMEOUT while a
+single request re-renders the page.
+
+Pages with random content (CTASnippetBlock) call vary_randomly(); they are
+cached as a pool of PAGE_CACHE_VARIANTS responses and each hit picks one at
+random, so the rotation keeps working.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from site_settings import cache as fragment_cache
+
+
+PAGE_CACHE_TIMEOUT = getattr(settings, "PAGE_CACHE_TIMEOUT", 300)
+PAGE_CACHE_STALE_TIMEOUT = getattr(settings, "PAGE_CACHE_STALE_TIMEOUT", 60)
+PAGE_CACHE_VARIANTS = getattr(settings, "PAGE_CACHE_VARIANTS", 4)
+
+# how long a re-rendering request holds the lock before another one may try
+REVALIDATE_LOCK_TIMEOUT = 30
+
+DEPENDENCIES = [fragment_cache.PAGES]
+
+
+def is_pending(request):
+    """
+    Whether the middleware is waiting to store the response to `request`.
+    """
+    return getattr(request, "_page_cache_versions", None) is not None
+
+
+def allow_caching(request):
+    """
+    Let the response to `request` be stored. Called when Wagtail serves a public page.
+    """
+    request._page_cache_allowed = True
+
+
+def vary_randomly(request):
+    """
+    Mark the page being rendered as picking random content, so it's cached as a pool of variants.
+    """
+    if request is not None:
+        request._page_cache_pooled = True
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not getattr(request, "is_preview", False)
+    )
+
+
+def get_cache_key(request, variant=None):
+    return fragment_cache.make_key(
+        "page",
+        request.get_host(),
+        translation.get_language(),
+        request.path,
+        sorted(request.GET.lists()),
+        variant,
+    )
+
+
+def get_cached_response(request):
+    """
+    Return the cached response for `request`, or None if the page has to be rendered.
+    """
+    key = get_cache_key(request)
+    versions, cached = fragment_cache.get_versioned(key, DEPENDENCIES)
+    # a re-rendered page is stored against the versions read before rendering
+    request._page_cache_versions = versions
+    if cached is not None and cached[1].get("pooled"):
+        request._page_cache_variant = random.randrange(PAGE_CACHE_VARIANTS)
+        key = get_cache_key(request, request._page_cache_variant)
+        versions, cached = fragment_cache.get_versioned(key, DEPENDENCIES)
+
+    if cached is None:
+        return None
+
+    stored_versions, entry = cached
+    if stored_versions == versions and time.time() - entry["created"] < PAGE_CACHE_TIMEOUT:
+        return build_response(request, entry, "HIT")
+
+    # stale: the first request re-renders the page, the others get the old copy meanwhile
+    if cache.add(f"{key}:revalidating", True, REVALIDATE_LOCK_TIMEOUT):
+        return None
+    return build_response(request, entry, "STALE")
+
+
+def build_response(request, entry, status):
+    response = HttpResponse(entry["content"], status=entry["status"])
+    for header, value in entry["headers"]:
+        response.headers[header] = value
+    response.headers["X-Page-Cache"] = status
+    # pages that set an ETag or Last-Modified (feeds) still answer conditional requests
+    return get_conditional_response(
+        request,
+        etag=response.get("ETag"),
+        last_modified=parse_http_date_safe(response.get("Last-Modified")),
+        response=response,
+    )
+
+
+def store_response(request, response):
+    """
+    Cache `response` if the page allowed it and nothing personal ended up in it.
+    """
+    if (
+        not getattr(request, "_page_cache_allowed", False)
+        or request.method != "GET"
+        or response.status_code != 200
+        or response.streaming
+        or response.cookies
+        or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        or "private" in response.get("Cache-Control", "")
+        or "no-store" in response.get("Cache-Control", "")
+    ):
+        return
+
+    timeout = PAGE_CACHE_TIMEOUT + PAGE_CACHE_STALE_TIMEOUT
+    versions = request._page_cache_versions
+    key = get_cache_key(request)
+    if getattr(request, "_page_cache_pooled", False):
+        cache.set(key, (versions, {"pooled": True}), timeout)
+        variant = getattr(request, "_page_cache_variant", None)
+        if variant is None:
+            variant = random.randrange(PAGE_CACHE_VARIANTS)
+        key = get_cache_key(request, variant)
+
+    cache.set(
+        key,
+        (versions, {
+            "created": time.time(),
+            "status": response.status_code,
+            "headers": list(response.items()),
+            "content": response.content,
+        }),
+        timeout,
+    )
+    cache.delete(f"{key}:revalidating")
+    response.headers["X-Page-Cache"] = "MISS"
+
+
+class PageCacheMiddleware:
+    """
+    Serve anonymous page views from the full-page cache. Goes after
+    AuthenticationMiddleware and LocaleMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_cacheable_request(request):
+            return self.get_response(request)
+
+        response = get_cached_response(request)
+        if response is not None:
+            return response
+
+        response = self.get_response(request)
+        store_response(request, response)
+        return response
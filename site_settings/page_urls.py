@@ -0,0 +1,361 @@
+"""
+In-memory map of page URLs.
+
+``page.url`` and ``{% pageurl %}`` look up the site root paths and reverse
+the page's path again for every link. Each process keeps instead the
+url_path of every page, loaded in one query, and turns them into URLs per
+site root path and active language, so resolving the links of a page costs
+no queries:
+
+    {% load page_url_tags %}
+    <a href="{% cached_pageurl child %}">
+
+    from site_settings import page_urls
+    url = page_urls.get_url(page, request)
+
+The map is built when the process starts (see website/wsgi.py, or on the
+first lookup) and kept up to date by the signal receivers at the bottom of
+this module, like the search suggestions: the process that handles a
+publish, move or slug change updates its own map page by page (or subtree by
+subtree) and bumps a shared version, which makes the other processes rebuild
+theirs on their next lookup. Lookups read the version once per request.
+"""
+import threading
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.urls import NoReverseMatch, reverse
+from django.utils import translation
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.models import Page, Site
+from wagtail.signals import page_published, page_slug_changed, post_page_move
+
+
+VERSION_CACHE_KEY = "page-urls:version"
+
+# the characters reverse() leaves unquoted in a path
+SAFE_PATH_CHARS = "/~:@!$&'()*+,;="
+
+_lock = threading.RLock()
+# (version, PageUrls) held by this process
+_process_urls = (None, None)
+
+
+class PageUrls:
+    """
+    The url_path of every page and the site root paths, with the
+    ``(site_id, root_url, path)`` URL parts of each page per active language
+    worked out on first use, one entry per site root path the page is under
+    (in the order of Site.get_site_root_paths(), like Page.get_url_parts()).
+    """
+
+    def __init__(self, root_paths, url_paths):
+        self.reset(root_paths, url_paths)
+
+    def reset(self, root_paths, url_paths):
+        self.root_paths = list(root_paths)
+        self.num_sites = len({root_path.site_id for root_path in self.root_paths})
+        # page id -> url_path
+        self.url_paths = dict(url_paths)
+        # language -> {page id: ((site_id, root_url, path), ...)}
+        self.by_language = {}
+        # (root path, language) -> the path reverse() gives the site root
+        self.prefixes = {}
+
+    def get_prefix(self, root_path, language):
+        key = (root_path, language)
+        if key not in self.prefixes:
+            self.prefixes[key] = self.reverse_root(root_path.language_code, language)
+        return self.prefixes[key]
+
+    @staticmethod
+    def reverse_root(language_code, language):
+        if not getattr(settings, "WAGTAIL_I18N_ENABLED", False):
+            try:
+                return reverse("wagtail_serve", args=("",))
+            except NoReverseMatch:
+                return None
+
+        # a variant of the page's language that is active (en-us for en) is used instead
+        try:
+            if language and get_supported_content_language_variant(language) == language_code:
+                language_code = language
+        except LookupError:
+            pass
+        with translation.override(language_code):
+            try:
+                return reverse("wagtail_serve", args=("",))
+            except NoReverseMatch:
+                return None
+
+    def make_parts(self, url_path, language):
+        append_slash = getattr(settings, "WAGTAIL_APPEND_SLASH", True)
+        parts = []
+        for root_path in self.root_paths:
+            if not url_path.startswith(root_path.root_path):
+                continue
+            prefix = self.get_prefix(root_path, language)
+            if prefix is None:
+                parts.append((root_path.site_id, None, None))
+                continue
+            path = prefix + quote(url_path[len(root_path.root_path):], safe=SAFE_PATH_CHARS)
+            if not append_slash and path != "/":
+                path = path.rstrip("/")
+            parts.append((root_path.site_id, root_path.root_url, path))
+        return tuple(parts)
+
+    def for_language(self, language):
+        with _lock:
+            urls = self.by_language.get(language)
+            if urls is None:
+                urls = {
+                    page_id: self.make_parts(url_path, language)
+                    for page_id, url_path in self.url_paths.items()
+                }
+                self.by_language[language] = urls
+            return urls
+
+    def set(self, url_paths):
+        """
+        Add or update the pages of the `url_paths` {page id: url_path} dict.
+        """
+        with _lock:
+            self.url_paths.update(url_paths)
+            for language, urls in self.by_language.items():
+                for page_id, url_path in url_paths.items():
+                    urls[page_id] = self.make_parts(url_path, language)
+
+    def remove(self, page_ids):
+        with _lock:
+            for page_id in page_ids:
+                self.url_paths.pop(page_id, None)
+                for urls in self.by_language.values():
+                    urls.pop(page_id, None)
+
+
+def load_url_paths(pages):
+    return dict(pages.values_list("id", "url_path"))
+
+
+def build_urls():
+    """
+    Load the site root paths and the url_path of every page (the tree root
+    has no URL).
+    """
+    return PageUrls(Site.get_site_root_paths(), load_url_paths(Page.objects.filter(depth__gt=1)))
+
+
+def publish_urls(urls):
+    global _process_urls
+
+    version = uuid.uuid4().hex
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    _process_urls = (version, urls)
+
+
+def get_urls(request=None):
+    """
+    Return this process's PageUrls, rebuilding them if another process
+    published a change since they were built. The result is kept on
+    `request`, so the version is only read once per request.
+    """
+    global _process_urls
+
+    urls = getattr(request, "_page_urls", None)
+    if urls is not None:
+        return urls
+
+    version = cache.get(VERSION_CACHE_KEY)
+    with _lock:
+        current_version, urls = _process_urls
+        if urls is not None and version is None:
+            # evicted, or a cache that doesn't keep anything (DummyCache in dev):
+            # announce this process's version again rather than rebuilding
+            cache.add(VERSION_CACHE_KEY, current_version, timeout=None)
+        elif urls is None or version != current_version:
+            urls = build_urls()
+            if version is None:
+                version = uuid.uuid4().hex
+                if not cache.add(VERSION_CACHE_KEY, version, timeout=None):
+                    version = cache.get(VERSION_CACHE_KEY, version)
+            _process_urls = (version, urls)
+
+    if request is not None:
+        request._page_urls = urls
+    return urls
+
+
+def get_url_parts(page, request=None, urls=None):
+    """
+    Like ``page.get_url_parts(request)``: the ``(site_id, root_url, path)`` of
+    `page` (a page or a page id), or None if it isn't routable. `urls` is the
+    PageUrls to read, when the caller already has it.
+    """
+    page_id = getattr(page, "pk", page)
+    if urls is None:
+        urls = get_urls(request)
+    language = translation.get_language()
+    possible_sites = urls.for_language(language).get(page_id)
+    if possible_sites is None:
+        # created since the map was loaded here, and not announced yet
+        urls.set(load_url_paths(Page.objects.filter(pk=page_id)))
+        possible_sites = urls.for_language(language).get(page_id)
+    if not possible_sites:
+        return None
+
+    parts = possible_sites[0]
+    if len({site_id for site_id, _, _ in possible_sites}) > 1 and request is not None:
+        site = Site.find_for_request(request)
+        if site is not None:
+            parts = next((values for values in possible_sites if values[0] == site.pk), parts)
+    return parts
+
+
+def is_current(page, urls):
+    """
+    Whether the map can be used for `page`: previews of unsaved pages and of
+    a changed slug aren't in it.
+    """
+    if page.pk is None:
+        return False
+    url_path = page.__dict__.get("url_path")
+    return url_path is None or urls.url_paths.get(page.pk, url_path) == url_path
+
+
+def get_url(page, request=None):
+    """
+    Like ``page.get_url(request)``: the relative URL of `page` (a page or a
+    page id) when it's on the request's site or there is only one site, the
+    full URL otherwise, or None if it isn't routable.
+    """
+    urls = get_urls(request)
+    if isinstance(page, Page) and not is_current(page, urls):
+        return page.get_url(request)
+
+    parts = get_url_parts(page, request, urls)
+    if parts is None or parts[2] is None:
+        return None
+
+    site_id, root_url, path = parts
+    if urls.num_sites == 1:
+        return path
+    site = Site.find_for_request(request) if request is not None else None
+    if site is not None and site.pk == site_id:
+        return path
+    return root_url + path
+
+
+def get_full_url(page, request=None):
+    """
+    Like ``page.get_full_url(request)``.
+    """
+    urls = get_urls(request)
+    if isinstance(page, Page) and not is_current(page, urls):
+        return page.get_full_url(request)
+
+    parts = get_url_parts(page, request, urls)
+    if parts is None or parts[2] is None:
+        return None
+    return parts[1] + parts[2]
+
+
+class SitemapUrlsMixin:
+    """
+    Build the sitemap entry of the page from the URL map.
+    """
+
+    def get_sitemap_urls(self, request=None):
+        return [
+            {
+                "location": get_full_url(self, request),
+                "lastmod": self.last_published_at or self.latest_revision_created_at,
+            }
+        ]
+
+
+def _update(change):
+    """
+    Apply `change(urls)` to this process's map, if it has built it, and tell
+    the other processes to rebuild.
+    """
+    with _lock:
+        urls = _process_urls[1]
+        if urls is not None:
+            change(urls)
+            publish_urls(urls)
+        else:
+            cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def rebuild():
+    def change(urls):
+        rebuilt = build_urls()
+        urls.reset(rebuilt.root_paths, rebuilt.url_paths)
+
+    _update(change)
+
+
+def is_site_root(page):
+    """
+    Whether `page` is the root page of a site, or one of its translations:
+    the site root paths change with its url_path.
+    """
+    return Site.objects.filter(root_page__translation_key=page.translation_key).exists()
+
+
+def page_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created or not isinstance(instance, Page):
+        return
+
+    if is_site_root(instance):
+        # a new translation of a site's root page adds a root path
+        transaction.on_commit(rebuild)
+        return
+
+    page_id = instance.pk
+    transaction.on_commit(
+        lambda: _update(lambda urls: urls.set(load_url_paths(Page.objects.filter(pk=page_id))))
+    )
+
+
+def page_changed(sender, instance, **kwargs):
+    page_id = instance.pk
+    transaction.on_commit(
+        lambda: _update(lambda urls: urls.set(load_url_paths(Page.objects.filter(pk=page_id))))
+    )
+
+
+def pages_moved(sender, instance, **kwargs):
+    # the URLs of the whole subtree changed
+    if is_site_root(instance):
+        transaction.on_commit(rebuild)
+        return
+
+    path = instance.path
+    transaction.on_commit(
+        lambda: _update(lambda urls: urls.set(load_url_paths(Page.objects.filter(path__startswith=path))))
+    )
+
+
+def page_deleted(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        page_id = instance.pk
+        transaction.on_commit(lambda: _update(lambda urls: urls.remove([page_id])))
+
+
+def site_changed(sender, instance, **kwargs):
+    transaction.on_commit(rebuild)
+
+
+def register_signal_handlers():
+    post_save.connect(page_saved)
+    page_published.connect(page_changed)
+    post_page_move.connect(pages_moved)
+    page_slug_changed.connect(pages_moved)
+    post_delete.connect(page_deleted)
+    post_save.connect(site_changed, sender=Site)
+    post_delete.connect(site_changed, sender=Site)
@@ -0,0 +1,190 @@
+"""
+Cached rich text expansion.
+
+Stored rich text refers to pages and images by id (``<a linktype="page"
+id="3">``, ``<embed embedtype="image" id="7" .../>``), and Wagtail looks them up
+again on every render to write the links and image tags. The expanded HTML is
+cached here under a hash of the stored HTML (and the language, page links
+point to the translation in the active language) and depends on the pages and
+images it references, so it is only rebuilt when one of them is published,
+unpublished, moved or deleted, or an image is edited (see signals.py).
+
+Rich text fields shown in listings go through expand_many(), which reads all
+the fragments in one cache round trip and expands the missing ones together:
+one query per referenced model for the whole list instead of one lookup per
+card.
+
+The page link and image embed handlers are replaced (see wagtail_hooks.py)
+with ones that also batch what Wagtail's do per reference: the translations
+of the linked pages in the active language, and the renditions of the
+embedded images.
+
+Templates use the ``richtext_tags`` library instead of Wagtail's filter:
+
+    {% load richtext_tags %}
+    {{ article.intro|cached_richtext }}
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.functional import Promise
+from django.utils.html import escape
+from wagtail.images.formats import get_image_format
+from wagtail.images.rich_text import ImageEmbedHandler
+from wagtail.models import Locale, Page
+from wagtail.rich_text import RichText, expand_db_html, extract_references_from_rich_text
+from wagtail.rich_text.pages import PageLinkHandler
+
+from site_settings import cache as fragment_cache
+from site_settings import page_urls
+
+
+# joins the sources expanded in one go, comments are left alone by the rewriters
+SEPARATOR = "<!-- richtext-expansion-boundary -->"
+
+
+class BatchedPageLinkHandler(PageLinkHandler):
+    """
+    Link to the translations of the pages in the active language, found in one
+    query for all the links rather than one per link (``page.localized``).
+    """
+    @classmethod
+    def expand_db_attributes_many(cls, attrs_list):
+        return [
+            '<a href="%s">' % escape(page_urls.get_url(page)) if page else "<a>"
+            for page in localize(cls.get_many(attrs_list))
+        ]
+
+
+class BatchedImageEmbedHandler(ImageEmbedHandler):
+    """
+    Load the embedded images with the renditions of their formats, in two
+    queries for all the embeds rather than one rendition lookup per embed.
+    """
+    @classmethod
+    def get_many(cls, attrs_list):
+        filter_specs = set()
+        for attrs in attrs_list:
+            try:
+                filter_specs.add(get_image_format(attrs["format"]).filter_spec)
+            except KeyError:
+                pass
+        image_ids = [attrs.get("id") for attrs in attrs_list]
+        images = cls.get_model().objects.filter(id__in=image_ids).prefetch_renditions(*filter_specs)
+        images_by_str_id = {str(image.pk): image for image in images}
+        return [images_by_str_id.get(str(image_id)) for image_id in image_ids]
+
+
+def localize(pages):
+    """
+    Return the live translation in the active language of each of `pages`, or
+    the page itself, like ``page.localized``.
+    """
+    if not getattr(settings, "WAGTAIL_I18N_ENABLED", False):
+        return pages
+    try:
+        locale = Locale.get_active()
+    except (LookupError, Locale.DoesNotExist):
+        return pages
+
+    translation_keys = {page.translation_key for page in pages if page and page.locale_id != locale.id}
+    if not translation_keys:
+        return pages
+    translations = {
+        page.translation_key: page
+        for page in Page.objects.live().filter(translation_key__in=translation_keys, locale=locale)
+        .defer_streamfields().specific()
+    }
+    return [
+        translations.get(page.translation_key, page) if page and page.locale_id != locale.id else page
+        for page in pages
+    ]
+
+
+def cache_key(source):
+    return fragment_cache.make_key("richtext", translation.get_language(), source)
+
+
+def get_dependencies(source):
+    """
+    The dependency keys of the pages and images referenced in `source`, and
+    the page URLs.
+    """
+    return [
+        *{
+            fragment_cache.reference_dependency_key(model, object_id)
+            for model, object_id, _, _ in extract_references_from_rich_text(source)
+        },
+        fragment_cache.PAGE_URLS,
+    ]
+
+
+def expand_together(sources):
+    """
+    Expand `sources` with a single pass of Wagtail's rewriters, so the
+    references of all of them are resolved in one query per model.
+    """
+    if len(sources) == 1:
+        return [expand_db_html(sources[0])]
+
+    expanded = expand_db_html(SEPARATOR.join(sources)).split(SEPARATOR)
+    if len(expanded) != len(sources):
+        # a source contained the separator
+        return [expand_db_html(source) for source in sources]
+    return expanded
+
+
+def expand_many(sources):
+    """
+    Return the expanded HTML of each of `sources` (stored rich text strings).
+    """
+    keys = {}
+    for source in sources:
+        if source and source not in keys:
+            keys[source] = cache_key(source)
+    if not keys:
+        return ["" for _ in sources]
+
+    sources_by_key = {key: source for source, key in keys.items()}
+
+    def build(missing_keys):
+        missing_sources = [sources_by_key[key] for key in missing_keys]
+        return dict(zip(missing_keys, expand_together(missing_sources)))
+
+    expanded = fragment_cache.get_or_set_many(
+        {key: get_dependencies(source) for source, key in keys.items()},
+        build,
+    )
+    return [expanded[keys[source]] if source else "" for source in sources]
+
+
+def expand(source):
+    return expand_many([source])[0]
+
+
+def render(value):
+    """
+    Like Wagtail's ``richtext`` filter, with the expansion cached.
+    """
+    if isinstance(value, RichText):
+        value = value.source
+    elif value is None:
+        value = ""
+    elif isinstance(value, Promise):
+        value = str(value)
+    if not isinstance(value, str):
+        raise TypeError(f"expected a rich text string, got {type(value)}")
+    return render_to_string("wagtailcore/shared/richtext.html", {"html": expand(value)})
+
+
+def set_rendered(objects, *field_names):
+    """
+    Set ``<field_name>_html`` on each of `objects` to the rendered value of
+    each of the rich text fields `field_names`, expanding them all together,
+    and return the objects.
+    """
+    targets = [(obj, field_name) for obj in objects for field_name in field_names]
+    expanded = expand_many([getattr(obj, field_name) or "" for obj, field_name in targets])
+    for (obj, field_name), html in zip(targets, expanded):
+        setattr(obj, f"{field_name}_html", render_to_string("wagtailcore/shared/richtext.html", {"html": html}))
+    return objects
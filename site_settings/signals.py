@@ -0,0 +1,148 @@
+"""
+Signal receivers that evict cached fragments when the content they were built
+from changes. Connected in SiteSettingsConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from wagtail.contrib.settings.models import BaseGenericSetting, BaseSiteSetting
+from wagtail.images import get_image_model
+from wagtail.models import DraftStateMixin, Page, PageViewRestriction, get_page_models
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+    published,
+    unpublished,
+)
+
+from site_settings import cache as fragment_cache
+from site_settings.banner import publish_snapshot
+from site_settings.models import FAQ, FAQCategory, Banner
+
+# fields rendered in the navbar; a change to any of them rebuilds the menu
+MENU_FIELDS = ("show_in_menus", "live", "title", "slug")
+
+
+def page_changed(sender, instance, **kwargs):
+    """
+    Evict fragments depending on a page that was published, unpublished or deleted.
+    """
+    fragment_cache.invalidate_object(instance)
+
+
+def page_urls_changed(sender, instance, **kwargs):
+    """
+    A moved page or a new slug changes the URL of the page and all its descendants.
+    """
+    fragment_cache.invalidate_object(instance)
+    fragment_cache.invalidate(fragment_cache.PAGE_URLS, fragment_cache.MENU)
+
+
+def menu_fields_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Rebuild the menu when a saved page changes one of the fields the navbar shows.
+
+    Only full saves (publishing, unpublishing) and saves that list one of
+    MENU_FIELDS are compared; draft revisions are saved with update_fields
+    that don't. Reordering pages is handled by page_urls_changed
+    (post_page_move).
+    """
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(MENU_FIELDS):
+        return
+
+    stored = Page.objects.filter(pk=instance.pk).values(*MENU_FIELDS).first()
+    if stored is None:
+        # a brand new page only shows up in the menu once it's published
+        return
+
+    if any(stored[field] != getattr(instance, field) for field in MENU_FIELDS):
+        fragment_cache.invalidate(fragment_cache.MENU)
+
+
+def snippet_changed(sender, instance, **kwargs):
+    """
+    Evict fragments depending on a snippet that was published or unpublished.
+
+    Pages send the generic ``published`` signal as well, they're handled by page_changed.
+    """
+    if isinstance(instance, Page):
+        return
+    fragment_cache.invalidate_object(instance)
+
+
+def object_deleted(sender, instance, **kwargs):
+    """
+    Evict fragments depending on a deleted page or publishable snippet.
+    """
+    if isinstance(instance, Page):
+        page_changed(sender, instance)
+        if instance.show_in_menus:
+            fragment_cache.invalidate(fragment_cache.MENU)
+    elif isinstance(instance, DraftStateMixin):
+        fragment_cache.invalidate_object(instance)
+
+
+def faq_category_changed(sender, instance, **kwargs):
+    """
+    FAQ lists render the category names, so treat a category change as an FAQ change.
+    """
+    fragment_cache.invalidate(instance, FAQ)
+
+
+def banner_changed(sender, instance, **kwargs):
+    """
+    Rewrite the active banner snapshot when a banner is published, unpublished or deleted.
+    """
+    transaction.on_commit(publish_snapshot)
+
+
+def view_restriction_changed(sender, instance, **kwargs):
+    """
+    Making a page private or public again changes which links anonymous visitors
+    see anywhere on the site.
+    """
+    fragment_cache.invalidate(
+        f"page:{instance.page_id}", fragment_cache.MENU, fragment_cache.PAGE_URLS
+    )
+
+
+def setting_changed(sender, instance, **kwargs):
+    """
+    Site settings (footer text, social links) are rendered on every page.
+    """
+    if isinstance(instance, (BaseGenericSetting, BaseSiteSetting)):
+        fragment_cache.invalidate(fragment_cache.PAGES)
+
+
+def image_changed(sender, instance, **kwargs):
+    """
+    Evict the blocks showing an image that was edited (new file, focal point)
+    or deleted.
+    """
+    fragment_cache.invalidate_object(instance)
+
+
+def register_signal_handlers():
+    page_published.connect(page_changed)
+    page_unpublished.connect(page_changed)
+    post_page_move.connect(page_urls_changed)
+    page_slug_changed.connect(page_urls_changed)
+    for model in get_page_models():
+        pre_save.connect(menu_fields_changed, sender=model)
+    published.connect(snippet_changed)
+    unpublished.connect(snippet_changed)
+    post_delete.connect(object_deleted)
+    post_save.connect(faq_category_changed, sender=FAQCategory)
+    post_delete.connect(faq_category_changed, sender=FAQCategory)
+    published.connect(banner_changed, sender=Banner)
+    unpublished.connect(banner_changed, sender=Banner)
+    post_delete.connect(banner_changed, sender=Banner)
+    post_save.connect(view_restriction_changed, sender=PageViewRestriction)
+    post_delete.connect(view_restriction_changed, sender=PageViewRestriction)
+    post_save.connect(setting_changed)
+    post_save.connect(image_changed, sender=get_image_model())
+    post_delete.connect(image_changed, sender=get_image_model())
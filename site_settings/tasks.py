@@ -0,0 +1,18 @@
+from django_tasks import task
+
+from site_settings.models import BlockRenderSample, RequestSample
+
+
+@task()
+def store_request_samples_task(samples):
+    """
+    Store a batch of buffered request measurements and their block profiles,
+    see site_settings.instrumentation.
+    """
+    blocks = [sample.pop("blocks", []) for sample in samples]
+    requests = RequestSample.objects.bulk_create([RequestSample(**sample) for sample in samples])
+    BlockRenderSample.objects.bulk_create([
+        BlockRenderSample(request=request, **block)
+        for request, request_blocks in zip(requests, blocks)
+        for block in request_blocks
+    ])
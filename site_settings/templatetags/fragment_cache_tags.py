@@ -0,0 +1,64 @@
+from django import template
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+from site_settings import cache as fragment_cache
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, dependencies, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.dependencies = dependencies
+        self.vary_on = vary_on
+
+    def render(self, context):
+        request = context.get("request")
+        if request is None or getattr(request, "is_preview", False):
+            # previews show unpublished content, never cache them
+            return self.nodelist.render(context)
+
+        key = fragment_cache.make_key(
+            self.fragment_name,
+            request.get_host(),
+            translation.get_language(),
+            [var.resolve(context) for var in self.vary_on],
+        )
+        return mark_safe(fragment_cache.get_or_set(
+            key,
+            self.dependencies,
+            lambda: self.nodelist.render(context),
+        ))
+
+
+@register.tag("fragmentcache")
+def do_fragmentcache(parser, token):
+    """
+    Cache the contents of a template fragment until one of its dependencies changes.
+
+    The fragment is cached per site and language, and can also vary on a list
+    of template variables (like Django's {% cache %} tag).
+
+    Usage:
+        {% load fragment_cache_tags %}
+        {% fragmentcache "navbar" "menu,page-urls" request.user.is_authenticated %}
+            .. some expensive processing ..
+        {% endfragmentcache %}
+
+    Dependencies are a comma separated list of dependency keys, see
+    site_settings.cache.dependency_key().
+    """
+    nodelist = parser.parse(("endfragmentcache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(f"'{tokens[0]}' tag requires at least 2 arguments.")
+
+    return FragmentCacheNode(
+        nodelist,
+        tokens[1].strip("\"'"),
+        [dep.strip() for dep in tokens[2].strip("\"'").split(",") if dep.strip()],
+        [parser.compile_filter(t) for t in tokens[3:]],
+    )
@@ -0,0 +1,22 @@
+from django import template
+from django.shortcuts import resolve_url
+from wagtail.models import Page
+
+from site_settings import page_urls
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_pageurl(context, page, fallback=None):
+    """
+    Wagtail's ``pageurl`` tag, with the URL read from the in-memory page URL
+    map instead of resolved for every link (see site_settings.page_urls).
+    """
+    if page is None and fallback:
+        return resolve_url(fallback)
+
+    if not isinstance(page, Page):
+        raise ValueError("cached_pageurl tag expected a Page object, got %r" % page)
+
+    return page_urls.get_url(page, context.get("request"))
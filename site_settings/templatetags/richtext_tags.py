@@ -0,0 +1,14 @@
+from django import template
+
+from site_settings import richtext
+
+register = template.Library()
+
+
+@register.filter
+def cached_richtext(value):
+    """
+    Wagtail's ``richtext`` filter, with the expanded links and images cached
+    until one of them changes (see site_settings.richtext).
+    """
+    return richtext.render(value)
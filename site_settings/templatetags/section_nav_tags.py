@@ -1,15 +1,22 @@
 from django import template
 
+from wagtail.models import Page, Site
+
+from site_settings import cache as fragment_cache
+
 register = template.Library()
 
 
-@register.simple_tag
-def get_section_nav(page):
+@register.simple_tag(takes_context=True)
+def get_section_nav(context, page):
     """
-    Walk up the page tree to find the section root, category page, and sibling pages.
+    Find the section root, category page, and sibling pages of `page`.
 
     Works for any section of the site (Resources, About Us, etc.) — not tied
-    to a specific page type.
+    to a specific page type. The section root is the ancestor one level below
+    the site root and the category page the one two levels below, so both are
+    found by cutting the page's treebeard path. The result is cached per
+    category page, a cold cache costs two queries.
 
     Usage:
         {% load section_nav_tags %}
@@ -18,44 +25,63 @@ def get_section_nav(page):
         {{ section_nav.category_page.title }}
         {% for p in section_nav.sibling_pages %}...{% endfor %}
     """
+    request = context.get('request')
     try:
-        site_root = page.get_site().root_page
+        site = Site.find_for_request(request) if request is not None else page.get_site()
+        site_root = site.root_page
     except Exception:
         return {}
 
-    ancestors = list(page.get_ancestors().specific())
+    steplen = page.steplen
+    if not page.path.startswith(site_root.path) or page.depth < site_root.depth + 2:
+        # not below a section root
+        return {}
+    section_path = page.path[:len(site_root.path) + steplen]
+    category_path = page.path[:len(site_root.path) + 2 * steplen]
 
-    # Find the section root (direct child of site root among ancestors)
-    section_index = None
-    for ancestor in ancestors:
-        parent = ancestor.get_parent()
-        if parent and parent.id == site_root.id:
-            section_index = ancestor
-            break
+    def build_section_nav():
+        return _build_section_nav(section_path, category_path)
+
+    if request is not None and not getattr(request, 'is_preview', False):
+        section_nav = fragment_cache.get_or_set(
+            fragment_cache.make_key("section-nav", section_path, category_path),
+            [
+                # titles of the section and category pages, and the siblings
+                fragment_cache.children_dependency_key(site_root.path),
+                fragment_cache.children_dependency_key(section_path),
+                fragment_cache.children_dependency_key(category_path),
+                fragment_cache.PAGE_URLS,
+            ],
+            build_section_nav,
+        )
+    else:
+        section_nav = build_section_nav()
 
-    if not section_index:
+    if section_nav['section_index'] is None:
         return {}
+    return {**section_nav, 'current_page': page}
 
-    # Determine the category page (direct child of section_index)
-    category_page = None
-    if page.get_parent().id == section_index.id:
-        # This page IS a category page
-        category_page = page
-    else:
-        # Find the ancestor that's a direct child of section_index
-        for ancestor in ancestors:
-            parent = ancestor.get_parent()
-            if parent and parent.id == section_index.id:
-                category_page = ancestor
-                break
+
+def _build_section_nav(section_path, category_path):
+    """
+    Load the section and category pages in one query and the category's live
+    children in another.
+    """
+    pages = {
+        p.path: p
+        for p in Page.objects.filter(path__in={section_path, category_path}).specific(defer=True)
+    }
+    section_index = pages.get(section_path)
+    category_page = pages.get(category_path)
 
     sibling_pages = []
     if category_page:
-        sibling_pages = category_page.get_children().live().specific().order_by('title')
+        sibling_pages = list(
+            Page.objects.child_of(category_page).live().specific(defer=True).order_by('title')
+        )
 
     return {
         'section_index': section_index,
         'category_page': category_page,
         'sibling_pages': sibling_pages,
-        'current_page': page,
     }
@@ -0,0 +1,68 @@
+from django.test import TestCase, override_settings
+from django.template.loader import render_to_string
+
+from wagtail.models import Page
+
+from home.models import HomePage
+from site_settings import cache as fragment_cache
+from site_settings.banner import get_active_banner
+from site_settings.models import Banner
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "site-settings-tests",
+        },
+    },
+    # the manifest only exists after collectstatic
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class BannerSnapshotTests(TestCase):
+    def test_content_escaped_once(self):
+        banner = Banner.objects.create(
+            title="Registration", content="<p>Sign up &amp; <b>play</b></p>", is_active=True
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            banner.save_revision().publish()
+
+        self.assertEqual(get_active_banner().content, "Sign up & play")
+        html = render_to_string("base.html", {"active_banner": get_active_banner()})
+        self.assertIn("<span>Sign up &amp; play</span>", html)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "site-settings-menu-tests",
+        },
+    },
+)
+class MenuInvalidationTests(TestCase):
+    def setUp(self):
+        root = Page.get_first_root_node()
+        self.page = root.add_child(
+            instance=HomePage(title="Home", slug="menu-tests-home", show_in_menus=True)
+        )
+
+    def menu_version(self):
+        return fragment_cache.get_versioned("menu-tests", [fragment_cache.MENU])[0]
+
+    def test_draft_keeps_menu(self):
+        version = self.menu_version()
+        self.page.title = "Welcome"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save_revision()
+        self.assertEqual(self.menu_version(), version)
+
+    def test_publish_rebuilds_menu(self):
+        version = self.menu_version()
+        self.page.title = "Welcome"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save_revision().publish()
+        self.assertNotEqual(self.menu_version(), version)
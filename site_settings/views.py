@@ -0,0 +1,84 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Sum
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.admin.ui.tables import Column, TitleColumn
+from wagtail.admin.views.reports import ReportView
+from wagtail.permissions import page_permission_policy
+
+from site_settings.models import BlockRenderSample
+
+
+# the report covers the block profiles of the sampled requests of this many days
+BLOCK_REPORT_DAYS = getattr(settings, "BLOCK_RENDER_REPORT_DAYS", 7)
+
+
+def page_edit_url(row):
+    if row["page"] is None:
+        return None
+    return reverse("wagtailadmin_pages:edit", args=[row["page"]])
+
+
+class BlockRenderTimesView(ReportView):
+    """
+    The StreamField blocks of the site ranked by their average render time on
+    the sampled requests (see site_settings.instrumentation.profile_block()),
+    one row per page, stream child and block type.
+    """
+    page_title = "Block render times"
+    header_icon = "time"
+    index_url_name = "block_render_times"
+    index_results_url_name = "block_render_times_results"
+    permission_policy = page_permission_policy
+    any_permission_required = ["add", "change", "publish"]
+    default_ordering = "-avg_ms"
+    columns = [
+        TitleColumn("page__title", label="Page", get_url=page_edit_url, id_accessor="page"),
+        Column("block_type", label="Block"),
+        Column("block_id", label="Block id"),
+        Column("renders", label="Renders", sort_key="renders"),
+        Column("avg_ms", label="Average ms", sort_key="avg_ms", accessor=lambda row: f"{row['avg_ms']:.1f}"),
+        Column("max_ms", label="Max ms", sort_key="max_ms", accessor=lambda row: f"{row['max_ms']:.1f}"),
+        Column("total_ms", label="Total ms", sort_key="total_ms", accessor=lambda row: f"{row['total_ms']:.0f}"),
+        Column("avg_queries", label="Queries", sort_key="avg_queries", accessor=lambda row: f"{row['avg_queries']:.1f}"),
+        Column(
+            "avg_bytes", label="Output KiB", sort_key="avg_bytes",
+            accessor=lambda row: f"{row['avg_bytes'] / 1024:.1f}",
+        ),
+    ]
+    list_export = ["page__title", "block_type", "block_id", "renders", "avg_ms", "max_ms", "total_ms", "avg_queries", "avg_bytes"]
+    export_headings = {
+        "page__title": "Page",
+        "block_type": "Block",
+        "block_id": "Block id",
+        "renders": "Renders",
+        "avg_ms": "Average ms",
+        "max_ms": "Max ms",
+        "total_ms": "Total ms",
+        "avg_queries": "Queries",
+        "avg_bytes": "Output bytes",
+    }
+
+    def get_page_subtitle(self):
+        return f"Sampled requests of the last {BLOCK_REPORT_DAYS} days"
+
+    def get_filename(self):
+        return "block-render-times-{}".format(datetime.date.today().strftime("%Y-%m-%d"))
+
+    def get_base_queryset(self):
+        return (
+            BlockRenderSample.objects.filter(
+                request__created_at__gte=timezone.now() - datetime.timedelta(days=BLOCK_REPORT_DAYS)
+            )
+            .values("page", "page__title", "block_type", "block_id")
+            .annotate(
+                renders=Count("id"),
+                avg_ms=Avg("duration_ms"),
+                max_ms=Max("duration_ms"),
+                total_ms=Sum("duration_ms"),
+                avg_queries=Avg("queries"),
+                avg_bytes=Avg("output_bytes"),
+            )
+        )
@@ -1,7 +1,74 @@
+from django.urls import path, reverse
+from wagtail import hooks
+from wagtail.admin.menu import MenuItem
+from wagtail.contrib.forms.models import FormMixin
+from wagtail.models import PageViewRestriction
 from wagtail.snippets.models import register_snippet
 from wagtail.snippets.views.snippets import SnippetViewSet
 
+from site_settings import instrumentation, page_cache, richtext
 from site_settings.models import FAQ, FAQCategory, Banner
+from site_settings.views import BlockRenderTimesView
+
+
+@hooks.register("before_serve_page")
+def label_request_metrics(page, request, serve_args, serve_kwargs):
+    """
+    Label the request's measurements with the page type, and the sub-route of
+    routable pages (RoutablePageMixin.route() passes the view as the first
+    serve argument).
+    """
+    label = type(page).__name__
+    view = serve_args[0] if serve_args else None
+    if callable(view):
+        label = f"{label}:{view.__name__}"
+    instrumentation.set_label(label)
+
+
+@hooks.register("register_rich_text_features", order=1)
+def register_batched_rich_text_handlers(features):
+    # after Wagtail's own handlers, which these replace
+    features.register_link_type(richtext.BatchedPageLinkHandler)
+    features.register_embed_type(richtext.BatchedImageEmbedHandler)
+
+
+@hooks.register("register_admin_urls")
+def register_block_render_times_urls():
+    return [
+        path("reports/block-render-times/", BlockRenderTimesView.as_view(), name="block_render_times"),
+        path(
+            "reports/block-render-times/results/",
+            BlockRenderTimesView.as_view(results_only=True),
+            name="block_render_times_results",
+        ),
+    ]
+
+
+@hooks.register("register_reports_menu_item")
+def register_block_render_times_menu_item():
+    return MenuItem("Block render times", reverse("block_render_times"), name="block-render-times", icon_name="time", order=1000)
+
+
+@hooks.register("before_serve_page")
+def allow_page_caching(page, request, serve_args, serve_kwargs):
+    """
+    Let the full-page cache store public pages. Form pages (the contact page)
+    render a CSRF token and password protected or private pages depend on the
+    visitor, so they're always rendered.
+    """
+    if not page_cache.is_pending(request) or isinstance(page, FormMixin):
+        return
+
+    if page.alias_of_id:
+        restrictions = page.get_view_restrictions()
+    else:
+        # restrictions on the page or any of its ancestors, found by path in one query
+        ancestor_paths = [page.path[:i] for i in range(page.steplen, len(page.path) + 1, page.steplen)]
+        restrictions = PageViewRestriction.objects.filter(page__path__in=ancestor_paths)
+    if restrictions.exists():
+        return
+
+    page_cache.allow_caching(request)
 
 
 @register_snippet
@@ -70,10 +70,14 @@ INSTALLED_APPS = [
     'django.contrib.postgres',  # needed for wagtailsearch postgres search backend
     "django.contrib.staticfiles",
     "django.contrib.sitemaps",
+    "django_tasks",
+    "django_tasks.backends.database",
     "debug_toolbar",
 ]
 
 MIDDLEWARE = [
+    # measures everything below it, see site_settings/instrumentation.py
+    "site_settings.instrumentation.RequestMetricsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,6 +88,8 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
     "django.middleware.locale.LocaleMiddleware",
+    # needs the user and the active language, so it goes last
+    "site_settings.page_cache.PageCacheMiddleware",
 ]
 
 ROOT_URLCONF = "website.urls"
@@ -239,12 +245,52 @@ WAGTAIL_SITE_NAME = "website"
 
 # Search
 # https://docs.wagtail.org/en/stable/topics/search/backends.html
+# On PostgreSQL the database backend resolves to the Postgres full-text backend:
+# a tsvector per indexed object with GIN indexes, where the SearchField boosts
+# map to the A-D weights used for ranking.
 WAGTAILSEARCH_BACKENDS = {
     "default": {
         "BACKEND": "wagtail.search.backends.database",
+        "SEARCH_CONFIG": "english",
     }
 }
 
+# Background tasks (search index updates, rendition pre-generation).
+# Runs inline unless a settings module configures a worker backend, see prod.py.
+TASKS = {
+    "default": {
+        "BACKEND": "django_tasks.backends.immediate.ImmediateBackend",
+    }
+}
+
+# Request instrumentation (site_settings/instrumentation.py): Server-Timing
+# headers, query budgets and sampled measurements for `manage.py request_metrics`;
+# the blocks of sampled requests are profiled for the "Block render times" report
+REQUEST_METRICS_ENABLED = True
+# the header shows query counts, cache stats and page types to every visitor,
+# only send it in development (see dev.py)
+REQUEST_METRICS_SERVER_TIMING = False
+REQUEST_METRICS_SAMPLE_RATE = 0.05
+BLOCK_RENDER_REPORT_DAYS = 7
+
+# Queries allowed per request, by page type or "PageType:route" (a warning is
+# logged above the budget, QUERY_BUDGET_RAISE turns it into an error for tests)
+QUERY_BUDGETS = {
+    "HomePage": 40,
+    "FlexPage": 40,
+    "ResourcesIndex": 25,
+    "NewsIndex": 35,
+    "NewsItem": 35,
+    "ProgramIndex": 25,
+    "Program": 30,
+    "EventsPage": 25,
+    "FAQPage": 30,
+    "search": 35,
+    "page-cache": 2,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
 # Base URL to use when referring to full URLs within the Wagtail admin backend -
 # e.g. in notification emails. Don't include '/admin' or a trailing slash
 WAGTAILADMIN_BASE_URL = "http://example.com"
@@ -267,3 +313,11 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # https://docs.wagtail.org/en/stable/advanced_topics/privacy.html
 WAGTAIL_FRONTEND_LOGIN_TEMPLATE = "login.html"
 WAGTAIL_PASSWORD_REQUIRED_TEMPLATE = "password_required.html"
+
+# Full-page cache for anonymous visitors (site_settings/page_cache.py), in seconds.
+# Publishing anything evicts cached pages; stale pages are served for
+# PAGE_CACHE_STALE_TIMEOUT more while one request re-renders them.
+PAGE_CACHE_TIMEOUT = 300
+PAGE_CACHE_STALE_TIMEOUT = 60
+# number of cached copies of pages that show a random CTA
+PAGE_CACHE_VARIANTS = 4
@@ -18,6 +18,11 @@ CSRF_TRUSTED_ORIGINS=[
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# measure (and profile the blocks of) every request, and show the numbers in
+# the browser's network panel
+REQUEST_METRICS_SAMPLE_RATE = 1
+REQUEST_METRICS_SERVER_TIMING = True
+
 CACHES = {
     "default": {
         # "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
@@ -30,6 +30,17 @@ else:
         }
     }
 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    WAGTAILSEARCH_BACKENDS["default"]["BACKEND"] = "wagtail.search.backends.database.postgres.postgres"
+
+# Search index updates run in the "manage.py db_worker" process instead of
+# inside the request that saved the object.
+TASKS = {
+    "default": {
+        "BACKEND": "django_tasks.backends.database.DatabaseBackend",
+    }
+}
+
 WAGTAILADMIN_BASE_URL = f"http://{os.environ['VIRTUAL_HOST']}"
 
 sentry_sdk.init(
@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "website.settings.dev")
 
 application = get_wsgi_application()
+
+# Load the search suggestions before the first keystroke needs them, and the
+# page URLs before the first link
+from django.db import DatabaseError  # noqa: E402
+
+from search.suggestions import get_indexes  # noqa: E402
+from site_settings.page_urls import get_urls  # noqa: E402
+
+try:
+    get_indexes()
+    get_urls()
+except DatabaseError:
+    # not migrated yet, the first lookup will build them
+    pass